@@ -1,19 +1,21 @@
 # Backend/core/alerter.py
 import json
-from .logger import log
-from .messaging import publish_message
+from sqlalchemy.orm import Session
+from .outbox import add_outbox_event, queue_event
 
 ALERT_EXCHANGE_NAME = "alerts_exchange" # MUDANÇA: Usaremos um exchange
 
-def send_alert(title: str, message: str, level: str = "INFO"):
+def build_alert(title: str, message: str, level: str = "INFO") -> str:
+    """Serializes an alert the way the bots expect it."""
+    return json.dumps({ "title": title, "message": message, "level": level })
+
+def enqueue_alert(db: Session, title: str, message: str, level: str = "INFO", shard_key: str = None):
     """
-    Publishes an alert event to the alerts_exchange for all bots to consume.
+    Stages an alert in the caller's transaction (transactional outbox).
+    It is relayed to the exchange only if the transaction commits.
     """
-    try:
-        log.info(f"Publishing alert to exchange '{ALERT_EXCHANGE_NAME}': [{level}] {title}")
-        alert_payload = { "title": title, "message": message, "level": level }
-        
-        # MUDANÇA: Publicamos no exchange
-        publish_message(exchange_name=ALERT_EXCHANGE_NAME, message=json.dumps(alert_payload))
-    except Exception as e:
-        log.error(f"Failed to publish alert to RabbitMQ exchange. Error: {e}")
\ No newline at end of file
+    add_outbox_event(db, exchange=ALERT_EXCHANGE_NAME, body=build_alert(title, message, level), shard_key=shard_key)
+
+def queue_alert(title: str, message: str, level: str = "INFO"):
+    """Queues an alert raised outside of a write transaction in the local outbox log."""
+    queue_event(exchange=ALERT_EXCHANGE_NAME, body=build_alert(title, message, level))
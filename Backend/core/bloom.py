@@ -0,0 +1,264 @@
+# Backend/core/bloom.py
+"""
+Bloom filter of every existing short code, stored as a plain Redis bitmap.
+
+A definite miss lets the API answer 404 (or accept a new alias) without
+querying Postgres. URLs are never deleted, so the filter only ever gains
+bits: it is updated on every insert and rebuilt in place by streaming the
+table (rebuild_bloom.py, and snapshot_exporter.py whenever the filter is
+not ready). Until a full rebuild has finished, or while Redis is
+unreachable (or its circuit breaker is open), the filter answers "maybe"
+and callers fall back to the database.
+
+An insert whose bits could not be set invalidates the filter for every
+replica: it bumps an epoch and clears the ready key, and a rebuild that
+started before that bump does not mark the filter ready. If Redis cannot
+even be told, the process answers "maybe" itself and a background thread
+keeps retrying the invalidation, whether or not requests arrive.
+"""
+import hashlib
+import math
+import threading
+import time
+from typing import Callable, Iterable, List, Optional, Tuple
+from redis import Redis, RedisError
+from .cache import get_cache
+from .config import settings
+from .logger import log
+from .resilience import CircuitOpenError, redis_breaker
+
+BLOOM_KEY = settings.bloom_key
+BLOOM_CAPACITY = settings.bloom_capacity
+BLOOM_ERROR_RATE = settings.bloom_error_rate
+BLOOM_RETRY_INTERVAL = settings.bloom_retry_interval
+
+# Um bitmap do Redis tem no máximo 2^32 bits (512 MB).
+MAX_BITS = 2 ** 32
+
+# Marca o filtro como pronto só se nenhuma invalidação (epoch) aconteceu desde o início do rebuild.
+_MARK_READY = """
+local epoch = redis.call('GET', KEYS[2]) or ''
+if epoch ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2])
+return 1
+"""
+
+
+def optimal_parameters(capacity: int, error_rate: float) -> Tuple[int, int]:
+    """Returns (bits, hash functions) for the given capacity and target error rate."""
+    bits = math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+    bits = min(bits, MAX_BITS)
+    hashes = max(1, round(bits / capacity * math.log(2)))
+    return bits, hashes
+
+
+def bit_positions(item: str, bits: int, hashes: int) -> List[int]:
+    """Kirsch-Mitzenmacher double hashing: k positions from a single digest."""
+    digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+    h1 = int.from_bytes(digest[:8], "little")
+    h2 = int.from_bytes(digest[8:], "little") | 1
+    return [(h1 + i * h2) % bits for i in range(hashes)]
+
+
+class ShortCodeBloomFilter:
+    """
+    Redis-backed Bloom filter for short codes.
+    The bitmap key embeds the sizing, so changing capacity or error rate
+    starts a fresh (not yet ready) filter instead of corrupting the old one.
+    """
+
+    def __init__(self, client: Redis, key: str = BLOOM_KEY, capacity: int = BLOOM_CAPACITY,
+                 error_rate: float = BLOOM_ERROR_RATE, retry_interval: float = BLOOM_RETRY_INTERVAL):
+        self.client = client
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.retry_interval = retry_interval
+        self.bits, self.hashes = optimal_parameters(capacity, error_rate)
+        self.key = f"{key}:{self.bits}:{self.hashes}"
+        self.ready_key = f"{self.key}:ready"
+        self.epoch_key = f"{self.key}:epoch"
+        # Contadores locais ao processo, usados para medir a taxa real de falsos positivos.
+        self.definite_misses = 0
+        self.false_positives = 0
+        self._ready_seen = False
+        self._mark_ready = None
+        # Invalidações que falharam e ainda não foram refeitas: até lá o processo responde "talvez".
+        self._pending_invalidations = 0
+        self._retry_thread = None
+        self._retry_lock = threading.Lock()
+
+    @property
+    def _dirty(self) -> bool:
+        return self._pending_invalidations > 0
+
+    def _set_bits(self, codes: Iterable[str]):
+        pipe = self.client.pipeline(transaction=False)
+        for code in codes:
+            for position in bit_positions(code, self.bits, self.hashes):
+                pipe.setbit(self.key, position, 1)
+        pipe.execute()
+
+    def add(self, short_code: str):
+        """Adds a newly created code to the filter."""
+        try:
+            with redis_breaker.guard():
+                self._set_bits([short_code])
+        except (RedisError, CircuitOpenError) as e:
+            log.error(f"Failed to add '{short_code}' to the Bloom filter. Error: {e}")
+            # Sem o código no filtro haveria falsos negativos: desliga o filtro até o próximo rebuild.
+            # Tentado mesmo com o breaker aberto, pois a correção vale mais que a latência aqui.
+            self._invalidate()
+
+    def _clear_ready(self):
+        # Epoch e "ready" juntos (MULTI): um rebuild em andamento também deixa de marcar o filtro como pronto.
+        pipe = self.client.pipeline(transaction=True)
+        pipe.incr(self.epoch_key)
+        pipe.delete(self.ready_key)
+        pipe.execute()
+
+    def _invalidate(self):
+        """
+        Turns the filter off for every replica until the next rebuild. If Redis
+        cannot be reached, this process answers "maybe" and retries in the background.
+        """
+        try:
+            self._clear_ready()
+        except RedisError as e:
+            log.error(f"Could not invalidate the Bloom filter; answering 'maybe' until it is. Error: {e}")
+            with self._retry_lock:
+                self._pending_invalidations += 1
+                if self._retry_thread is None:
+                    self._retry_thread = threading.Thread(
+                        target=self._retry_invalidation, name="bloom-invalidate", daemon=True
+                    )
+                    self._retry_thread.start()
+
+    def _retry_invalidation(self):
+        while True:
+            time.sleep(self.retry_interval)
+            pending = self._pending_invalidations
+            try:
+                with redis_breaker.guard():
+                    self._clear_ready()
+            except (RedisError, CircuitOpenError):
+                continue
+            with self._retry_lock:
+                # Uma falha nova durante a tentativa exige outra invalidação.
+                if self._pending_invalidations == pending:
+                    self._pending_invalidations = 0
+                    self._retry_thread = None
+                    log.info("Bloom filter invalidated after a failed add; it answers 'maybe' until the next rebuild.")
+                    return
+
+    def might_contain(self, short_code: str) -> bool:
+        """
+        Returns False only when the code certainly does not exist.
+        Any Redis problem, or a filter that was never fully built, answers True.
+        So does a filter that missed an add() while Redis was down, until its
+        ready key has been cleared (retried in the background, not here).
+        """
+        if self._dirty:
+            self._ready_seen = False
+            return True
+        try:
+            with redis_breaker.guard():
+                pipe = self.client.pipeline(transaction=False)
+                pipe.exists(self.ready_key)
+                for position in bit_positions(short_code, self.bits, self.hashes):
+                    pipe.getbit(self.key, position)
+                ready, *bits = pipe.execute()
+        except CircuitOpenError:
+            self._ready_seen = False
+            return True
+        except RedisError as e:
+            log.warning(f"Bloom filter unavailable, falling back to the database. Error: {e}")
+            self._ready_seen = False
+            return True
+        self._ready_seen = bool(ready)
+        if not ready:
+            return True
+        if all(bits):
+            return True
+        self.definite_misses += 1
+        return False
+
+    def record_false_positive(self):
+        """Called when the filter said "maybe" but the database had no such code."""
+        if self._ready_seen:
+            self.false_positives += 1
+
+    def rebuild(self, codes: Iterable[str], batch_size: int = 10000) -> int:
+        """
+        Streams every existing code into the filter and marks it ready.
+        Runs in place, so inserts made by the API during the pass are kept.
+        If an insert failed to reach the filter meanwhile (the epoch moved),
+        the filter is left not ready and the next rebuild tries again.
+        """
+        epoch = self.client.get(self.epoch_key) or ""
+        total = 0
+        batch: List[str] = []
+        for code in codes:
+            batch.append(code)
+            if len(batch) >= batch_size:
+                self._set_bits(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            self._set_bits(batch)
+            total += len(batch)
+        if self._mark_ready is None:
+            self._mark_ready = self.client.register_script(_MARK_READY)
+        if not self._mark_ready(keys=[self.ready_key, self.epoch_key], args=[epoch, total]):
+            log.warning("Bloom filter changed during the rebuild (a failed add); it stays not ready until the next one.")
+        return total
+
+    def rebuild_if_needed(self, codes: Callable[[], Iterable[str]], batch_size: int = 10000) -> Optional[int]:
+        """
+        Rebuilds the filter from `codes()` when it is not ready (never built,
+        or invalidated by a failed add). Returns the number of codes streamed,
+        or None when the filter was already ready.
+        """
+        with redis_breaker.guard():
+            if self.client.exists(self.ready_key):
+                return None
+        return self.rebuild(codes(), batch_size)
+
+    def stats(self) -> dict:
+        """
+        Reports sizing, the false-positive rate estimated from the bitmap fill
+        ratio, and the rate observed by this process.
+        """
+        result = {
+            "capacity": self.capacity,
+            "target_error_rate": self.error_rate,
+            "bits": self.bits,
+            "hashes": self.hashes,
+            "ready": False,
+            "estimated_false_positive_rate": None,
+            "observed_false_positive_rate": None,
+        }
+        negatives = self.definite_misses + self.false_positives
+        if negatives:
+            result["observed_false_positive_rate"] = self.false_positives / negatives
+        try:
+            with redis_breaker.guard():
+                result["ready"] = bool(self.client.exists(self.ready_key))
+                fill_ratio = self.client.bitcount(self.key) / self.bits
+        except (RedisError, CircuitOpenError) as e:
+            log.warning(f"Could not read Bloom filter stats. Error: {e}")
+            return result
+        result["fill_ratio"] = fill_ratio
+        result["estimated_false_positive_rate"] = fill_ratio ** self.hashes
+        return result
+
+
+bloom_filter = None
+
+def get_bloom_filter() -> ShortCodeBloomFilter:
+    """Dependency function to get the shared short code Bloom filter, created on first use."""
+    global bloom_filter
+    if bloom_filter is None:
+        bloom_filter = ShortCodeBloomFilter(get_cache())
+    return bloom_filter
@@ -1,15 +1,33 @@
-import os
 import redis
-from dotenv import load_dotenv
+from redis.backoff import NoBackoff
+from redis.retry import Retry
+from .config import settings
 
-load_dotenv()
+REDIS_HOST = settings.redis_host
+REDIS_PORT = settings.redis_port
+# O Redis agora está no caminho das requisições: falhas precisam ser rápidas.
+REDIS_SOCKET_TIMEOUT = settings.redis_socket_timeout
+REDIS_RETRIES = settings.redis_retries
 
-REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
-REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
-
-# decode_responses=True garante que as respostas do Redis venham como strings.
-redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0, decode_responses=True)
+redis_client = None
 
 def get_cache():
-    """Dependency function to get a Redis client instance."""
-    return redis_client
\ No newline at end of file
+    """Dependency function to get a Redis client instance, created on first use."""
+    global redis_client
+    if redis_client is None:
+        # decode_responses=True garante que as respostas do Redis venham como strings.
+        redis_client = redis.Redis(
+            host=REDIS_HOST,
+            port=REDIS_PORT,
+            db=0,
+            decode_responses=True,
+            socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+            socket_timeout=REDIS_SOCKET_TIMEOUT,
+            retry=Retry(NoBackoff(), REDIS_RETRIES),
+        )
+    return redis_client
+
+def close_cache():
+    """Closes the client's connection pool (application shutdown); it reconnects if used again."""
+    if redis_client is not None:
+        redis_client.close()
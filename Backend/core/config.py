@@ -0,0 +1,155 @@
+# Backend/core/config.py
+"""
+Central settings, read once from the environment (and `.env`).
+
+This is the only module that calls load_dotenv(). Importing it has no other
+side effect: it never connects to anything and never fails because a
+variable is missing. Connections are created on first use by the modules
+that own them (database, cache, messaging), and a missing DATABASE_URL is
+only reported when a database session is actually needed.
+"""
+import os
+from typing import List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Nome fixo (não configurável) da fila de cliques; o relay e o worker dependem dele.
+CLICK_QUEUE_NAME = "click_events_queue"
+
+
+def _str(name: str, default: Optional[str] = None) -> Optional[str]:
+    return os.getenv(name, default)
+
+
+def _int(name: str, default: int) -> int:
+    return int(os.getenv(name, default))
+
+
+def _float(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
+
+
+def _bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes")
+
+
+def _list(name: str) -> List[str]:
+    return [item.strip() for item in os.getenv(name, "").split(",") if item.strip()]
+
+
+class Settings:
+    """
+    Every setting of the application. Defaults are applied when the object
+    is created, so tests can build a fresh Settings() after changing the
+    environment.
+    """
+
+    def __init__(self):
+        # --- Banco de dados ---
+        self.database_url = _str("DATABASE_URL")
+        # Lista separada por vírgulas; a ordem importa (novos shards sempre no final).
+        self.shard_database_urls = _list("SHARD_DATABASE_URLS")
+        self.shard_fanout_reads = _bool("SHARD_FANOUT_READS", False)
+        self.db_connect_timeout = _int("DB_CONNECT_TIMEOUT", 2)
+        # 0 desliga; jobs em lote (snapshot, bloom, rebalance) fazem consultas longas de propósito.
+        self.db_statement_timeout_ms = _int("DB_STATEMENT_TIMEOUT_MS", 0)
+        self.db_pool_timeout = _float("DB_POOL_TIMEOUT", 2)
+
+        # --- Redis ---
+        self.redis_host = _str("REDIS_HOST", "localhost")
+        self.redis_port = _int("REDIS_PORT", 6379)
+        # O Redis está no caminho das requisições: falhas precisam ser rápidas.
+        self.redis_socket_timeout = _float("REDIS_SOCKET_TIMEOUT", 0.5)
+        self.redis_retries = _int("REDIS_RETRIES", 1)
+
+        # --- RabbitMQ ---
+        self.rabbitmq_url = _str("RABBITMQ_URL")
+        self.rabbitmq_connect_timeout = _float("RABBITMQ_CONNECT_TIMEOUT", 2)
+        self.rabbitmq_blocked_timeout = _float("RABBITMQ_BLOCKED_TIMEOUT", 10)
+
+        # --- Eventos de clique ---
+        self.click_transport = os.getenv("CLICK_TRANSPORT", "amqp").lower()
+        self.click_stream_key = _str("CLICK_STREAM_KEY", "click_events")
+        self.click_stream_group = _str("CLICK_STREAM_GROUP", "click_workers")
+        self.click_stream_maxlen = _int("CLICK_STREAM_MAXLEN", 1_000_000)
+        self.click_reclaim_idle_ms = _int("CLICK_RECLAIM_IDLE_MS", 60_000)
+        self.click_batch_size = _int("CLICK_BATCH_SIZE", 200)
+        self.click_batch_wait = _float("CLICK_BATCH_WAIT", 1.0)
+        self.click_partitions = _int("CLICK_PARTITIONS", 1)
+        # Maior CLICK_PARTITIONS já usado: filas/streams fora da faixa atual até este limite são esvaziados.
+        self.click_partitions_max = _int("CLICK_PARTITIONS_MAX", 64)
+        self.click_batch_min = _int("CLICK_BATCH_MIN", 10)
+        self.click_batch_max = _int("CLICK_BATCH_MAX", 2000)
+        self.click_batch_step = _int("CLICK_BATCH_STEP", 50)
+        self.click_target_latency = _float("CLICK_TARGET_LATENCY", 0.1)
+        self.worker_shutdown_timeout = _float("WORKER_SHUTDOWN_TIMEOUT", 30)
+
+        # --- Outbox ---
+        self.outbox_dir = _str("OUTBOX_DIR", "data/outbox")
+        self.outbox_segment_seconds = _int("OUTBOX_SEGMENT_SECONDS", 2)
+        self.outbox_batch_size = _int("OUTBOX_BATCH_SIZE", 500)
+        self.outbox_poll_interval = _float("OUTBOX_POLL_INTERVAL", 0.5)
+
+        # --- Snapshot de redirecionamentos e filtro de Bloom ---
+        self.snapshot_path = _str("SNAPSHOT_PATH", "data/redirect_snapshot.bin")
+        self.snapshot_reload_interval = _float("SNAPSHOT_RELOAD_INTERVAL", 5)
+        self.snapshot_interval = _float("SNAPSHOT_INTERVAL", 60)
+        self.bloom_key = _str("BLOOM_KEY", "bloom:short_codes")
+        self.bloom_capacity = _int("BLOOM_CAPACITY", 10_000_000)
+        self.bloom_error_rate = _float("BLOOM_ERROR_RATE", 0.001)
+        # Intervalo (segundos) entre tentativas de invalidar o filtro depois de um add() que falhou.
+        self.bloom_retry_interval = _float("BLOOM_RETRY_INTERVAL", 1.0)
+
+        # --- HTTP ---
+        # max-age padrão (segundos) dos redirecionamentos permanentes sem cache_max_age próprio
+        self.redirect_cache_max_age = _int("REDIRECT_CACHE_MAX_AGE", 86400)
+
+        # --- Idempotency-Key ---
+        # Por quanto tempo (segundos) a resposta fica guardada para replays.
+        self.idempotency_ttl = _int("IDEMPOTENCY_TTL", 86400)
+        # Deve ser maior que a requisição mais lenta, senão uma repetição executa de novo.
+        self.idempotency_lock_ttl = _float("IDEMPOTENCY_LOCK_TTL", 30)
+        self.idempotency_wait_timeout = _float("IDEMPOTENCY_WAIT_TIMEOUT", 10)
+        # Chave do HMAC das impressões digitais guardadas no Redis (igual em todas as réplicas da API).
+        # Sem ela, pedidos com senha não usam idempotência: um hash simples permitiria ataque offline.
+        self.idempotency_secret = _str("IDEMPOTENCY_SECRET")
+
+        # --- Circuit breakers ---
+        self.breaker_failure_threshold = _int("BREAKER_FAILURE_THRESHOLD", 5)
+        self.breaker_reset_timeout = _float("BREAKER_RESET_TIMEOUT", 10)
+        self.breaker_half_open_calls = _int("BREAKER_HALF_OPEN_CALLS", 1)
+
+        # --- Logs ---
+        self.log_level = os.getenv("LOG_LEVEL", "INFO").upper()
+        # "text" (legível, colorido em terminais) ou "json" (uma linha compacta por evento)
+        self.log_format = os.getenv("LOG_FORMAT", "text").lower()
+        self.log_enqueue = _bool("LOG_ENQUEUE", True)
+        # Níveis por módulo, ex.: "worker=WARNING,Backend.routes.url=INFO"
+        self.log_levels = _str("LOG_LEVELS", "")
+        self.log_levels_file = _str("LOG_LEVELS_FILE")
+        # Só valem para o hot_log (uma linha por redirect/clique). Com LOG_RATE_LIMIT=0 e
+        # LOG_SAMPLE_RATE=1 nada é descartado e o hot_log custa o mesmo que o log comum.
+        self.log_sample_rate = _float("LOG_SAMPLE_RATE", 1.0)
+        self.log_rate_limit = _float("LOG_RATE_LIMIT", 100)
+
+        # --- Bots de alerta ---
+        self.telegram_bot_token = _str("TELEGRAM_BOT_TOKEN")
+        self.telegram_chat_id = _str("TELEGRAM_CHAT_ID")
+        self.discord_bot_token = _str("DISCORD_BOT_TOKEN")
+        self.discord_guild_id = _str("DISCORD_GUILD_ID")
+        self.discord_channel_id = _str("DISCORD_CHANNEL_ID")
+
+    @property
+    def database_urls(self) -> List[str]:
+        """One URL per shard; DATABASE_URL alone is a single shard."""
+        if self.shard_database_urls:
+            return list(self.shard_database_urls)
+        return [self.database_url] if self.database_url else []
+
+
+settings = Settings()
+
+def get_settings() -> Settings:
+    """Dependency function to get the application settings."""
+    return settings
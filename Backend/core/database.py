@@ -1,21 +1,71 @@
-import os
+from typing import Dict
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-from dotenv import load_dotenv
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+from .config import settings
+from .sharding import ShardRouter
 
-load_dotenv()
+DATABASE_URL = settings.database_url
+SHARD_DATABASE_URLS = settings.database_urls
+SHARD_FANOUT_READS = settings.shard_fanout_reads
 
-DATABASE_URL = os.getenv("DATABASE_URL")
+# Timeouts curtos: com o Postgres fora do ar, a requisição falha rápido e o circuit breaker abre.
+DB_CONNECT_TIMEOUT = settings.db_connect_timeout
+DB_STATEMENT_TIMEOUT_MS = settings.db_statement_timeout_ms
+DB_POOL_TIMEOUT = settings.db_pool_timeout
 
-if not DATABASE_URL:
-    raise ValueError("DATABASE_URL environment variable not set")
+def engine_options(url: str) -> dict:
+    """Keyword arguments for create_engine() with connect, statement and pool timeouts."""
+    if not url.startswith("postgresql"):
+        return {}
+    connect_args = {"connect_timeout": DB_CONNECT_TIMEOUT}
+    if DB_STATEMENT_TIMEOUT_MS:
+        connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+    return {"pool_timeout": DB_POOL_TIMEOUT, "connect_args": connect_args}
 
-#o ponto de entrada para o banco de dados.
-engine = create_engine(DATABASE_URL)
+# Engines e roteador são criados no primeiro uso: importar este módulo não abre nada.
+_engines: Dict[str, Engine] = {}
+_shard_router = None
 
-#instância de SessionLocal será uma sessão de banco de dados.
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def get_engines() -> Dict[str, Engine]:
+    """
+    One engine per shard, created on first use. The shard name is stable
+    ("shard0", "shard1", ...). Raises ValueError if no database is configured.
+    """
+    if not _engines:
+        if not SHARD_DATABASE_URLS:
+            raise ValueError("DATABASE_URL environment variable not set")
+        _engines.update(
+            (f"shard{i}", create_engine(url, **engine_options(url))) for i, url in enumerate(SHARD_DATABASE_URLS)
+        )
+    return _engines
+
+def get_shard_router() -> ShardRouter:
+    """Router that places each short_code on its shard (see sharding.py)."""
+    global _shard_router
+    if _shard_router is None:
+        _shard_router = ShardRouter(get_engines(), fanout_reads=SHARD_FANOUT_READS)
+    return _shard_router
+
+def dispose_engines(close: bool = True):
+    """
+    Closes the connection pools, e.g. on application shutdown. After a fork,
+    `close=False` drops the inherited connections without touching the
+    parent's sockets.
+    """
+    for engine in _engines.values():
+        engine.dispose(close=close)
+
+class RoutedSession(ShardedSession):
+    """ShardedSession that takes its shards and choosers from the lazily built router."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**{**get_shard_router().session_options(), **kwargs})
+
+#instância de SessionLocal será uma sessão roteada para o shard dono de cada short_code.
+SessionLocal = sessionmaker(class_=RoutedSession, autocommit=False, autoflush=False)
 
 #classe Base para que nossos modelos ORM herdem dela.
 Base = declarative_base()
@@ -30,4 +80,3 @@ def get_db():
         yield db
     finally:
         db.close()
-        
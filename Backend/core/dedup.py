@@ -0,0 +1,43 @@
+# Backend/core/dedup.py
+"""
+Destination fingerprints used to deduplicate short links.
+
+Two URLs that only differ in scheme/host case or an explicit default port
+lead to the same resource, so they share one fingerprint: the SHA-256 of
+the normalized URL, stored as 64 hex characters in the indexed
+`urls.original_url_hash` column. The fragment is kept: hash-routed pages
+(`/#/settings` vs `/#/billing`) and anchors are different destinations.
+"""
+import hashlib
+from urllib.parse import urlsplit, urlunsplit
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form of a destination: lowercase scheme and host, no default
+    port and "/" for an empty path. The query string and the fragment are
+    kept as is, since both can matter to the target.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if ":" in host:
+        host = f"[{host}]"  # IPv6
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    netloc = host
+    if port is not None and port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{host}:{port}"
+    if "@" in parts.netloc:
+        netloc = f"{parts.netloc.rsplit('@', 1)[0]}@{netloc}"
+    path = parts.path or ("/" if netloc else "")
+    return urlunsplit((scheme, netloc, path, parts.query, parts.fragment))
+
+
+def destination_hash(url: str) -> str:
+    """Fixed-width (64 hex chars) fingerprint of the normalized destination."""
+    return hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()
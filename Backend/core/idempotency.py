@@ -0,0 +1,182 @@
+# Backend/core/idempotency.py
+"""
+Idempotency keys for retried POST requests, stored in Redis.
+
+The first request with a given `Idempotency-Key` claims it with SET NX (an
+"in flight" record holding a random token and a lock TTL), runs, and then
+replaces the claim with its response, kept for IDEMPOTENCY_TTL seconds.
+Retries with the same key get that stored response back without running
+the handler again; a retry that arrives while the original is still in
+flight polls until the response is stored. Server errors (5xx) are not
+stored: the claim is released so the client can retry for real.
+
+The key is bound to a fingerprint of the request body, so reusing it for a
+different request is rejected instead of replaying an unrelated response.
+The fingerprint is an HMAC keyed with IDEMPOTENCY_SECRET: the body may hold
+a link password, and a plain hash kept in Redis could be brute-forced
+offline. Without a secret, bodies carrying secrets are not fingerprinted
+at all (see request_fingerprint).
+While Redis is unreachable (or its circuit breaker is open) requests run
+without idempotency rather than failing.
+"""
+import hashlib
+import hmac
+import json
+import secrets
+import time
+from typing import NamedTuple, Optional
+from redis import Redis, RedisError
+from .cache import get_cache
+from .config import settings
+from .logger import log
+from .resilience import CircuitOpenError, redis_breaker
+
+IDEMPOTENCY_TTL = settings.idempotency_ttl
+IDEMPOTENCY_LOCK_TTL = settings.idempotency_lock_ttl
+IDEMPOTENCY_WAIT_TIMEOUT = settings.idempotency_wait_timeout
+IDEMPOTENCY_SECRET = settings.idempotency_secret
+IDEMPOTENCY_POLL_INTERVAL = 0.05
+MAX_KEY_LENGTH = 255
+
+# Troca o registro só se ele ainda for a reivindicação deste processo (o lock pode ter expirado
+# e sido tomado por outra requisição). Um valor vazio libera a chave.
+_REPLACE_CLAIM = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+if ARGV[2] == '' then
+    redis.call('DEL', KEYS[1])
+else
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+end
+return 1
+"""
+
+
+class IdempotencyKeyReused(Exception):
+    """The key was already used for a request with a different body."""
+
+
+class IdempotencyInProgress(Exception):
+    """The original request is still running after the wait timeout."""
+
+
+class StoredResponse(NamedTuple):
+    status_code: int
+    body: dict
+
+
+class IdempotencyClaim(NamedTuple):
+    """Ownership of a key; pass it back to complete() or release()."""
+    key: str
+    value: str
+    fingerprint: str
+
+
+def request_fingerprint(payload: dict, secret: Optional[str], sensitive: bool = False) -> Optional[str]:
+    """
+    HMAC-SHA256 of the request body in canonical JSON, keyed with `secret`.
+    Without a secret, a `sensitive` body (one holding a password) gets no
+    fingerprint (None) and must run without idempotency; other bodies fall
+    back to a plain SHA-256.
+    """
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+    if secret:
+        return hmac.new(secret.encode("utf-8"), canonical, hashlib.sha256).hexdigest()
+    if sensitive:
+        return None
+    return hashlib.sha256(canonical).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Claims, completes and replays idempotency keys. Every Redis call goes
+    through the Redis circuit breaker; begin() returns None when Redis
+    cannot be used, and the caller then simply runs the request.
+    """
+
+    def __init__(self, client: Redis, ttl: int = IDEMPOTENCY_TTL, lock_ttl: float = IDEMPOTENCY_LOCK_TTL,
+                 wait_timeout: float = IDEMPOTENCY_WAIT_TIMEOUT, poll_interval: float = IDEMPOTENCY_POLL_INTERVAL,
+                 secret: Optional[str] = IDEMPOTENCY_SECRET, prefix: str = "idempotency",
+                 clock=time.monotonic, sleep=time.sleep):
+        self.client = client
+        self.secret = secret
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.prefix = prefix
+        self.clock = clock
+        self.sleep = sleep
+        self._replace_claim = None
+
+    def fingerprint(self, payload: dict, sensitive: bool = False) -> Optional[str]:
+        """Fingerprint of a request body under this store's secret (see request_fingerprint)."""
+        return request_fingerprint(payload, self.secret, sensitive)
+
+    def _redis_key(self, scope: str, key: str) -> str:
+        # O hash mantém o tamanho da chave no Redis fixo, qualquer que seja o header recebido.
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return f"{self.prefix}:{scope}:{digest}"
+
+    def begin(self, scope: str, key: str, fingerprint: str):
+        """
+        Returns an IdempotencyClaim when this request must run, a
+        StoredResponse to replay, or None when Redis is unavailable.
+        Raises IdempotencyKeyReused or IdempotencyInProgress.
+        """
+        redis_key = self._redis_key(scope, key)
+        claim_value = json.dumps({"token": secrets.token_hex(16), "fingerprint": fingerprint})
+        deadline = self.clock() + self.wait_timeout
+        try:
+            while True:
+                with redis_breaker.guard():
+                    if self.client.set(redis_key, claim_value, nx=True, px=int(self.lock_ttl * 1000)):
+                        return IdempotencyClaim(redis_key, claim_value, fingerprint)
+                    stored = self.client.get(redis_key)
+                if stored is not None:
+                    record = json.loads(stored)
+                    if record["fingerprint"] != fingerprint:
+                        raise IdempotencyKeyReused(key)
+                    if "status_code" in record:
+                        return StoredResponse(record["status_code"], record["body"])
+                # Em andamento (ou liberada entre o SET e o GET): espera e tenta de novo.
+                if self.clock() >= deadline:
+                    raise IdempotencyInProgress(key)
+                self.sleep(self.poll_interval)
+        except (RedisError, CircuitOpenError) as e:
+            log.warning(f"Idempotency store unavailable, running the request without it. Error: {e}")
+            return None
+
+    def _replace(self, claim: IdempotencyClaim, value: str) -> bool:
+        if self._replace_claim is None:
+            self._replace_claim = self.client.register_script(_REPLACE_CLAIM)
+        with redis_breaker.guard():
+            return bool(self._replace_claim(keys=[claim.key], args=[claim.value, value, self.ttl]))
+
+    def complete(self, claim: IdempotencyClaim, status_code: int, body: dict):
+        """Stores the response of a claimed request for replays."""
+        record = json.dumps({"fingerprint": claim.fingerprint, "status_code": status_code, "body": body})
+        try:
+            if not self._replace(claim, record):
+                log.warning("Idempotency claim expired before the response was stored.")
+        except (RedisError, CircuitOpenError) as e:
+            log.error(f"Failed to store idempotent response. Error: {e}")
+
+    def release(self, claim: IdempotencyClaim):
+        """Drops the claim without storing a response, so a retry runs again."""
+        try:
+            self._replace(claim, "")
+        except (RedisError, CircuitOpenError) as e:
+            # O lock expira sozinho após IDEMPOTENCY_LOCK_TTL.
+            log.error(f"Failed to release idempotency key. Error: {e}")
+
+
+idempotency_store: Optional[IdempotencyStore] = None
+
+def get_idempotency_store() -> IdempotencyStore:
+    """Dependency function to get the shared idempotency store, created on first use."""
+    global idempotency_store
+    if idempotency_store is None:
+        idempotency_store = IdempotencyStore(get_cache())
+    return idempotency_store
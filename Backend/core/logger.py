@@ -1,23 +1,314 @@
+import atexit
+import json
+import os
+import queue
+import random
+import signal
 import sys
+import threading
+import time
 from loguru import logger
+from .config import settings
 
+# --- Configuração (Backend/core/config.py) ---
+LOG_LEVEL = settings.log_level
+# "text" (legível, colorido em terminais) ou "json" (uma linha compacta por evento)
+LOG_FORMAT = settings.log_format
+# Com enqueue, a escrita no stderr acontece numa thread separada e não bloqueia a requisição.
+LOG_ENQUEUE = settings.log_enqueue
+# Níveis por módulo, ex.: "worker=WARNING,Backend.routes.url=INFO"
+LOG_LEVELS = settings.log_levels
+# Se definido, o arquivo (mesmo formato de LOG_LEVELS) é relido ao receber SIGHUP.
+LOG_LEVELS_FILE = settings.log_levels_file
+# Amostragem e limite (linhas por segundo, por call site) para logs de alta frequência.
+# O limite padrão (100/s) só descarta linhas sob carga; 0 desliga o limite.
+LOG_SAMPLE_RATE = settings.log_sample_rate
+LOG_RATE_LIMIT = settings.log_rate_limit
 
-logger.remove()
-
-logger.add(
-    sys.stderr,
-    level="INFO",
-    format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
-    colorize=True
+TEXT_FORMAT = (
+    "<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | "
+    "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>"
 )
 
-logger.add(
-    "logs/error.log",
-    level="ERROR",
-    rotation="25 MB",
-    retention="15 days",
-    format="{time} {level} {message}",
-    serialize=True
-)
+_module_levels = {}
+_resolved_levels = {}
+_level_numbers = {}
+_handler_ids = []
+
+
+def _level_no(level: str) -> int:
+    level_no = _level_numbers.get(level)
+    if level_no is None:
+        level_no = _level_numbers[level] = logger.level(level.upper()).no
+    return level_no
+
+
+def _threshold(name: str) -> int:
+    """Level for a module: the longest configured prefix wins, else LOG_LEVEL."""
+    threshold = _resolved_levels.get(name)
+    if threshold is None:
+        threshold, matched = _level_no(LOG_LEVEL), ""
+        for module, level_no in _module_levels.items():
+            if (name == module or name.startswith(module + ".")) and len(module) > len(matched):
+                threshold, matched = level_no, module
+        _resolved_levels[name] = threshold
+    return threshold
+
+
+def _module_filter(record) -> bool:
+    return record["level"].no >= _threshold(record["name"] or "")
+
+
+def _json_format(record) -> str:
+    payload = {
+        "t": record["time"].isoformat(timespec="milliseconds"),
+        "l": record["level"].name,
+        "src": f"{record['name']}:{record['function']}:{record['line']}",
+        "msg": record["message"],
+    }
+    if record["exception"] is not None:
+        payload["exc"] = repr(record["exception"].value)
+    record["extra"]["_json"] = json.dumps(payload, ensure_ascii=False, default=str)
+    return "{extra[_json]}\n"
+
+
+class BackgroundWriter:
+    """
+    Non-blocking loguru sink: the caller only puts the formatted line on an
+    in-process queue; a daemon thread writes whatever accumulated to the
+    stream in one call. Cheaper than loguru's own `enqueue=True`, which
+    pickles every record through a multiprocessing queue.
+    """
+
+    def __init__(self, stream, max_batch: int = 512):
+        self.stream = stream
+        self.max_batch = max_batch
+        self._reset()
+        atexit.register(self.flush)
+        # Threads não sobrevivem a um fork: o processo filho cria a sua na primeira linha de log.
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        # A thread só nasce com a primeira linha: importar o logger não inicia nada.
+        with self._lock:
+            if self._thread is None:
+                thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                thread.start()
+                self._thread = thread
+
+    def __call__(self, message):
+        if self._thread is None:
+            self._start()
+        self._queue.put(message)
+
+    def _write_available(self, first):
+        lines = [first]
+        try:
+            while len(lines) < self.max_batch:
+                lines.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        self.stream.write("".join(lines))
+        self.stream.flush()
+
+    def _run(self):
+        while True:
+            self._write_available(self._queue.get())
+
+    def flush(self):
+        """Writes everything still queued from the calling thread (used at exit)."""
+        try:
+            while True:
+                self._write_available(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+
+
+_stderr_writer = None
+
+
+def configure_logging():
+    """
+    (Re)installs the sinks. The stderr sink accepts the lowest level any
+    module is configured for, so loguru can still drop everything below it
+    before the message is formatted.
+    """
+    for handler_id in _handler_ids:
+        logger.remove(handler_id)
+    _handler_ids.clear()
+
+    global _stderr_writer
+    if LOG_ENQUEUE and _stderr_writer is None:
+        _stderr_writer = BackgroundWriter(sys.stderr)
+
+    min_level = min([_level_no(LOG_LEVEL), *_module_levels.values()])
+    json_mode = LOG_FORMAT == "json"
+    _handler_ids.append(logger.add(
+        _stderr_writer if LOG_ENQUEUE else sys.stderr,
+        level=min_level,
+        format=_json_format if json_mode else TEXT_FORMAT,
+        colorize=not json_mode and sys.stderr.isatty(),
+        filter=_module_filter,
+    ))
+    # Erros são raros: o arquivo continua síncrono para não perder nada num crash.
+    _handler_ids.append(logger.add(
+        "logs/error.log",
+        level="ERROR",
+        delay=True,  # O arquivo (e a pasta logs/) só é criado no primeiro erro, não ao importar.
+        rotation="25 MB",
+        retention="15 days",
+        format="{time} {level} {message}",
+        serialize=True,
+    ))
+
+
+def flush_logs():
+    """
+    Writes out lines still queued for stderr. Needed before os._exit(),
+    e.g. at the end of a multiprocessing child, where atexit does not run.
+    """
+    if _stderr_writer is not None:
+        _stderr_writer.flush()
+
+
+def set_module_level(module: str, level: str):
+    """
+    Changes the log level of a module (and its submodules) at runtime,
+    e.g. set_module_level("worker", "WARNING").
+    """
+    level_no = _level_no(level)
+    lowers_minimum = level_no < min([_level_no(LOG_LEVEL), *_module_levels.values()])
+    _module_levels[module] = level_no
+    _resolved_levels.clear()
+    if lowers_minimum:
+        configure_logging()
+
+
+def load_module_levels(spec: str):
+    """Applies a "module=LEVEL,module=LEVEL" specification."""
+    for item in spec.replace("\n", ",").split(","):
+        if "=" in item:
+            module, level = item.split("=", 1)
+            set_module_level(module.strip(), level.strip())
+
+
+def _reload_levels_file():
+    try:
+        with open(LOG_LEVELS_FILE, encoding="utf-8") as f:
+            load_module_levels(f.read())
+        logger.info(f"Log levels reloaded from '{LOG_LEVELS_FILE}'.")
+    except OSError as e:
+        logger.error(f"Could not read LOG_LEVELS_FILE '{LOG_LEVELS_FILE}'. Error: {e}")
+
+
+_reload_requested = threading.Event()
+_reload_thread = None
+
+
+def _request_reload(*_):
+    # Só sinaliza: o handler roda no meio do código da thread principal, que pode estar
+    # segurando o lock de um sink do loguru; logar ou reconfigurar aqui travaria o processo.
+    _reload_requested.set()
+
+
+def _reload_loop():
+    while True:
+        _reload_requested.wait()
+        _reload_requested.clear()
+        _reload_levels_file()
+
+
+def _start_reload_thread():
+    global _reload_thread
+    _reload_thread = threading.Thread(target=_reload_loop, name="log-levels-reload", daemon=True)
+    _reload_thread.start()
+
+
+def _restart_reload_thread_after_fork():
+    # O handler de SIGHUP é herdado pelo fork, a thread não.
+    if _reload_thread is not None:
+        _start_reload_thread()
+
+
+class SampledLogger:
+    """
+    Logger for high-frequency call sites (one line per redirect or click).
+    Lines below the module's level, and lines dropped by sampling (each call
+    site keeps `sample_rate` of its lines and at most `max_per_second` of
+    them), are discarded before loguru builds a record or formats anything.
+    Use `{}` placeholders with arguments instead of f-strings so the message
+    is only built when it is written. Without sampling and rate limit
+    (LOG_SAMPLE_RATE=1, LOG_RATE_LIMIT=0) nothing can be dropped early, so
+    `info`/`debug` are loguru's own methods and cost what `log.info` does.
+    """
+
+    def __init__(self, sample_rate: float = LOG_SAMPLE_RATE, max_per_second: float = LOG_RATE_LIMIT):
+        self.sample_rate = sample_rate
+        self.max_per_second = max_per_second
+        self._buckets = {}
+        if sample_rate >= 1.0 and max_per_second <= 0:
+            # Sem nada a descartar, a checagem prévia só custaria tempo; o filtro do sink aplica os níveis.
+            self.debug, self.info = logger.debug, logger.info
+
+    def _allow(self, site) -> bool:
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return False
+        if self.max_per_second <= 0:
+            return True
+        now = time.monotonic()
+        burst = max(1.0, self.max_per_second)
+        tokens, last = self._buckets.get(site, (burst, now))
+        tokens = min(burst, tokens + (now - last) * self.max_per_second)
+        if tokens < 1.0:
+            self._buckets[site] = (tokens, now)
+            return False
+        self._buckets[site] = (tokens - 1.0, now)
+        return True
+
+    def _log(self, level: str, level_no: int, message: str, args, kwargs):
+        frame = sys._getframe(2)
+        # Checa o nível do módulo antes que o loguru monte o registro (a parte cara).
+        if level_no < _threshold(frame.f_globals.get("__name__", "")):
+            return
+        if self._allow((frame.f_code.co_filename, frame.f_lineno)):
+            _caller_logger.log(level, message, *args, **kwargs)
+
+    def debug(self, message: str, *args, **kwargs):
+        self._log("DEBUG", _DEBUG, message, args, kwargs)
+
+    def info(self, message: str, *args, **kwargs):
+        self._log("INFO", _INFO, message, args, kwargs)
+
+
+def install_reload_handler():
+    """
+    Loads LOG_LEVELS_FILE and re-reads it on SIGHUP. Called by each process
+    entry point (API lifespan, worker, relay, exporter) rather than at import,
+    so importing this module never installs a signal handler. The handler
+    only wakes a small daemon thread, which does the actual reload.
+    """
+    if LOG_LEVELS_FILE and hasattr(signal, "SIGHUP") and threading.current_thread() is threading.main_thread():
+        _reload_levels_file()
+        if _reload_thread is None:
+            _start_reload_thread()
+            os.register_at_fork(after_in_child=_restart_reload_thread_after_fork)
+        signal.signal(signal.SIGHUP, _request_reload)
+
+
+# Importar só registra os sinks no loguru: a thread de escrita nasce na primeira linha de log,
+# o arquivo de erros no primeiro erro, e o handler de SIGHUP com install_reload_handler().
+logger.remove()
+load_module_levels(LOG_LEVELS)
+configure_logging()
+
+_DEBUG, _INFO = _level_no("DEBUG"), _level_no("INFO")
+# depth=2: a linha registrada é a de quem chamou hot_log.info(), não a do SampledLogger.
+_caller_logger = logger.opt(depth=2)
 
-log = logger
\ No newline at end of file
+log = logger
+hot_log = SampledLogger()
@@ -1,31 +1,479 @@
 # Backend/core/messaging.py
 import pika
 import os
-from dotenv import load_dotenv
+from pika.adapters.blocking_connection import ReturnedMessage
+from pika.exceptions import ChannelClosedByBroker, UnroutableError
+from abc import ABC, abstractmethod
+import redis
+import socket
+import threading
+import time
+from typing import Callable, Dict, List
+from .cache import REDIS_HOST, REDIS_PORT
+from .config import CLICK_QUEUE_NAME, settings
 from .logger import log
+from .resilience import CircuitOpenError, rabbitmq_breaker, redis_breaker
+from .sharding import HashRing
 
-load_dotenv()
-RABBITMQ_URL = os.getenv("RABBITMQ_URL")
-
-def publish_message(exchange_name: str, message: str):
-    """
-    Publishes a message to a fanout exchange in RabbitMQ.
-    """
-    try:
-        connection = pika.BlockingConnection(pika.URLParameters(RABBITMQ_URL))
-        channel = connection.channel()
-        # MUDANÇA: Declaramos o exchange do tipo 'fanout'
-        channel.exchange_declare(exchange=exchange_name, exchange_type='fanout')
-        
-        # MUDANÇA: Publicamos no exchange, sem routing_key específica
-        channel.basic_publish(
-            exchange=exchange_name,
-            routing_key='', # Fanout ignora a routing key
-            body=message,
-            properties=pika.BasicProperties(delivery_mode=2)
+RABBITMQ_URL = settings.rabbitmq_url
+# Sem isso o pika espera até o timeout padrão do sistema em cada tentativa de conexão.
+RABBITMQ_CONNECT_TIMEOUT = settings.rabbitmq_connect_timeout
+RABBITMQ_BLOCKED_TIMEOUT = settings.rabbitmq_blocked_timeout
+
+def connection_parameters(url: str = RABBITMQ_URL) -> pika.URLParameters:
+    """
+    Connection parameters with tight timeouts and a single attempt.
+    Options given in the URL query string take precedence.
+    """
+    parameters = pika.URLParameters(url)
+    query = url.split("?", 1)[1] if "?" in url else ""
+    if "socket_timeout" not in query:
+        parameters.socket_timeout = RABBITMQ_CONNECT_TIMEOUT
+    if "stack_timeout" not in query:
+        parameters.stack_timeout = RABBITMQ_CONNECT_TIMEOUT * 2
+    if "blocked_connection_timeout" not in query:
+        parameters.blocked_connection_timeout = RABBITMQ_BLOCKED_TIMEOUT
+    if "connection_attempts" not in query:
+        parameters.connection_attempts = 1
+    return parameters
+
+class BatchPublisher:
+    """
+    Long-lived transactional RabbitMQ channel, used by the outbox relay.
+    Each batch is published inside one AMQP transaction: the broker accepts
+    all of its messages with a single tx.commit round-trip, and a batch is
+    only reported as published once that commit succeeded. A batch that
+    fails before the commit is discarded by the broker, so a retry does not
+    duplicate it.
+    """
+
+    def __init__(self, url: str = RABBITMQ_URL):
+        self.url = url
+        self.connection = None
+        self.channel = None
+        self._declared = set()
+        self._returned = []
+
+    def _ensure_channel(self):
+        if self.channel is not None and self.channel.is_open:
+            return
+        self.close()
+        self.connection = pika.BlockingConnection(connection_parameters(self.url))
+        self.channel = self.connection.channel()
+        # Transação em vez de confirm_delivery: com confirms, cada basic_publish esperaria o próprio ack.
+        self.channel.tx_select()
+        self.channel.add_on_return_callback(self._on_return)
+        self._declared = set()
+
+    def _on_return(self, channel, method, properties, body):
+        self._returned.append(ReturnedMessage(method, properties, body))
+
+    def _declare(self, exchange: str, routing_key: str):
+        target = (exchange, routing_key if not exchange else "")
+        if target in self._declared:
+            return
+        if exchange:
+            # Todos os exchanges nomeados da aplicação são do tipo fanout.
+            self.channel.exchange_declare(exchange=exchange, exchange_type='fanout')
+        else:
+            self.channel.queue_declare(queue=routing_key, durable=True)
+        self._declared.add(target)
+
+    def publish_batch(self, events):
+        """
+        Publishes (exchange, routing_key, body) events in order, in one
+        transaction. Raises if the broker is unreachable or returns a message
+        as unroutable (UnroutableError), so the caller can keep the events for
+        the next attempt, and raises CircuitOpenError without connecting while
+        the RabbitMQ breaker is open.
+        """
+        try:
+            with rabbitmq_breaker.guard():
+                self._ensure_channel()
+                self._returned = []
+                for exchange, routing_key, body in events:
+                    self._declare(exchange, routing_key)
+                    self.channel.basic_publish(
+                        exchange=exchange,
+                        routing_key=routing_key,
+                        body=body,
+                        properties=pika.BasicProperties(delivery_mode=2),
+                        mandatory=True
+                    )
+                self.channel.tx_commit()
+                # O Basic.Return chega antes do Tx.CommitOk; isto só entrega os callbacks já recebidos.
+                self.connection.process_data_events(time_limit=0)
+                if self._returned:
+                    raise UnroutableError(self._returned)
+        except CircuitOpenError:
+            raise
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        """Closes the connection, ignoring errors from an already broken one."""
+        try:
+            if self.connection is not None and self.connection.is_open:
+                self.connection.close()
+        except Exception:
+            pass
+        self.connection = None
+        self.channel = None
+
+
+# --- Transporte dos eventos de clique ---
+CLICK_TRANSPORT = settings.click_transport
+CLICK_STREAM_KEY = settings.click_stream_key
+CLICK_STREAM_GROUP = settings.click_stream_group
+# Corte aproximado do stream; precisa ser maior que o maior backlog esperado.
+CLICK_STREAM_MAXLEN = settings.click_stream_maxlen
+CLICK_RECLAIM_IDLE_MS = settings.click_reclaim_idle_ms
+CLICK_BATCH_SIZE = settings.click_batch_size
+CLICK_BATCH_WAIT = settings.click_batch_wait
+# Partições (filas ou streams) por hash consistente do short_code; uma por processo do worker.
+# O relay e o worker precisam usar o mesmo valor.
+CLICK_PARTITIONS = settings.click_partitions
+CLICK_PARTITIONS_MAX = settings.click_partitions_max
+# Limites e alvo de latência (segundos por lote no banco) do tamanho de lote adaptativo.
+CLICK_BATCH_MIN = settings.click_batch_min
+CLICK_BATCH_MAX = settings.click_batch_max
+CLICK_BATCH_STEP = settings.click_batch_step
+CLICK_TARGET_LATENCY = settings.click_target_latency
+
+ClickHandler = Callable[[List[str]], None]
+
+def partition_name(base: str, partition: int, partitions: int) -> str:
+    """Queue or stream name of a partition; a single partition keeps the original name."""
+    return base if partitions <= 1 else f"{base}.{partition}"
+
+def stale_partition_names(base: str, partitions: int, limit: int = CLICK_PARTITIONS_MAX) -> List[str]:
+    """
+    Names a different CLICK_PARTITIONS value (up to `limit`) would have used
+    and the current one does not: the unsuffixed name once partitioned, and
+    every suffixed name outside 0..partitions-1.
+    """
+    if partitions <= 1:
+        return [f"{base}.{partition}" for partition in range(limit)]
+    return [base] + [f"{base}.{partition}" for partition in range(partitions, limit)]
+
+class ClickPartitioner:
+    """
+    Assigns short codes to partitions with the same consistent hash ring used
+    for database shards, so each hot `urls` row is only ever updated by the
+    worker process that owns its partition, and changing the partition count
+    only moves about 1/N of the codes.
+    """
+
+    def __init__(self, partitions: int = CLICK_PARTITIONS):
+        self.partitions = max(1, partitions)
+        self.ring = HashRing([str(i) for i in range(self.partitions)]) if self.partitions > 1 else None
+
+    def partition_for(self, short_code: str) -> int:
+        return int(self.ring.get(short_code)) if self.ring else 0
+
+    def split(self, short_codes: List[str]) -> Dict[int, List[str]]:
+        """Groups codes by partition, keeping their relative order."""
+        groups: Dict[int, List[str]] = {}
+        for short_code in short_codes:
+            groups.setdefault(self.partition_for(short_code), []).append(short_code)
+        return groups
+
+class AdaptiveBatchSize:
+    """
+    AIMD control of the consumer batch size from observed database latency.
+    A full batch that was applied within `target_latency` grows the size by
+    `step`; a slower one halves it. Small batches on a slow database keep
+    transactions short; large ones on a fast database amortize the commit.
+    """
+
+    def __init__(self, initial: int = CLICK_BATCH_SIZE, minimum: int = CLICK_BATCH_MIN,
+                 maximum: int = CLICK_BATCH_MAX, step: int = CLICK_BATCH_STEP,
+                 target_latency: float = CLICK_TARGET_LATENCY):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.step = step
+        self.target_latency = target_latency
+        self.size = min(max(initial, self.minimum), self.maximum)
+
+    def observe(self, batch_len: int, latency: float) -> int:
+        """Records how long a batch took and returns the next batch size."""
+        if latency > self.target_latency:
+            self.size = max(self.minimum, self.size // 2)
+        elif batch_len >= self.size:
+            self.size = min(self.maximum, self.size + self.step)
+        return self.size
+
+class ClickTransport(ABC):
+    """
+    Moves click events (one short code each) from the outbox relay to worker.py.
+    `consume` blocks, calling `handle_batch` with lists of short codes, and
+    only acknowledges a batch after the handler returned without raising.
+    Publishing spreads codes over CLICK_PARTITIONS partitions; a consumer
+    reads the single partition it was created for. `stop()` (e.g. from a
+    SIGTERM handler) makes `consume` return once the batch in flight has
+    been applied and acknowledged. `drain_stale_partitions` empties the
+    queues or streams left behind by an earlier CLICK_PARTITIONS value.
+    """
+    name = ""
+
+    def __init__(self, partition: int = 0, partitions: int = CLICK_PARTITIONS, batching: AdaptiveBatchSize = None):
+        self.partition = partition
+        self.partitioner = ClickPartitioner(partitions)
+        self.batching = batching or AdaptiveBatchSize()
+        self._stopping = threading.Event()
+
+    @property
+    def stopped(self) -> bool:
+        return self._stopping.is_set()
+
+    def stop(self):
+        self._stopping.set()
+
+    def wait(self, seconds: float):
+        """Sleeps, waking up early if stop() is called."""
+        self._stopping.wait(seconds)
+
+    def _apply(self, handle_batch: ClickHandler, short_codes: List[str]):
+        started = time.monotonic()
+        handle_batch(short_codes)
+        self.batching.observe(len(short_codes), time.monotonic() - started)
+
+    @abstractmethod
+    def publish_clicks(self, short_codes: List[str]):
+        """Publishes one click event per short code."""
+
+    @abstractmethod
+    def consume(self, handle_batch: ClickHandler):
+        """Blocks, passing batches of short codes to `handle_batch`, until stop()."""
+
+    def drain_stale_partitions(self, handle_batch: ClickHandler) -> int:
+        """
+        Passes every event waiting in a partition this layout no longer
+        consumes (see stale_partition_names) to `handle_batch`, and returns
+        how many there were. Transports without partitions have none.
+        """
+        return 0
+
+    def close(self):
+        pass
+
+class AmqpClickTransport(ClickTransport):
+    """Click events as persistent messages on durable RabbitMQ queues, one per partition."""
+    name = "amqp"
+
+    def __init__(self, url: str = RABBITMQ_URL, queue: str = CLICK_QUEUE_NAME,
+                 batch_size: int = CLICK_BATCH_SIZE, batch_wait: float = CLICK_BATCH_WAIT, **kwargs):
+        kwargs.setdefault("batching", AdaptiveBatchSize(initial=batch_size, minimum=min(CLICK_BATCH_MIN, batch_size)))
+        super().__init__(**kwargs)
+        self.url = url
+        self.queue = queue
+        self.batch_wait = batch_wait
+        self.publisher = BatchPublisher(url)
+
+    def publish_clicks(self, short_codes: List[str]):
+        partitions = self.partitioner.partitions
+        self.publisher.publish_batch([
+            ("", partition_name(self.queue, partition, partitions), short_code)
+            for partition, codes in self.partitioner.split(short_codes).items()
+            for short_code in codes
+        ])
+
+    def consume(self, handle_batch: ClickHandler):
+        queue = partition_name(self.queue, self.partition, self.partitioner.partitions)
+        connection = pika.BlockingConnection(connection_parameters(self.url))
+        try:
+            channel = connection.channel()
+            # durable=True ensures that the queue will survive a RabbitMQ restart.
+            channel.queue_declare(queue=queue, durable=True)
+            # Prefetch de dois lotes: o próximo já está no cliente enquanto o atual vai ao banco.
+            prefetch = 2 * self.batching.size
+            channel.basic_qos(prefetch_count=prefetch)
+            batch, last_tag = [], None
+            for method, properties, body in channel.consume(queue, inactivity_timeout=self.batch_wait):
+                if method is not None:
+                    batch.append(body.decode())
+                    last_tag = method.delivery_tag
+                if batch and (method is None or len(batch) >= self.batching.size or self.stopped):
+                    self._apply(handle_batch, batch)
+                    # Um único ack confirma todo o lote.
+                    channel.basic_ack(delivery_tag=last_tag, multiple=True)
+                    batch = []
+                    if 2 * self.batching.size != prefetch:
+                        prefetch = 2 * self.batching.size
+                        channel.basic_qos(prefetch_count=prefetch)
+                if self.stopped and not batch:
+                    # Mensagens pré-carregadas e não confirmadas voltam para a fila.
+                    channel.cancel()
+                    return
+        finally:
+            if connection.is_open:
+                connection.close()
+
+    def _drain_queue(self, channel, queue: str, handle_batch: ClickHandler) -> int:
+        drained = 0
+        while not self.stopped:
+            batch, last_tag = [], None
+            while len(batch) < self.batching.size:
+                method, properties, body = channel.basic_get(queue)
+                if method is None:
+                    break
+                batch.append(body.decode())
+                last_tag = method.delivery_tag
+            if not batch:
+                break
+            self._apply(handle_batch, batch)
+            channel.basic_ack(delivery_tag=last_tag, multiple=True)
+            drained += len(batch)
+        return drained
+
+    def drain_stale_partitions(self, handle_batch: ClickHandler) -> int:
+        drained = 0
+        connection = pika.BlockingConnection(connection_parameters(self.url))
+        try:
+            channel = connection.channel()
+            for queue in stale_partition_names(self.queue, self.partitioner.partitions):
+                if self.stopped:
+                    break
+                try:
+                    declared = channel.queue_declare(queue=queue, durable=True, passive=True)
+                except ChannelClosedByBroker:
+                    # 404: a fila nunca existiu. O broker fecha o canal, então abrimos outro.
+                    channel = connection.channel()
+                    continue
+                if declared.method.message_count:
+                    drained += self._drain_queue(channel, queue, handle_batch)
+        finally:
+            if connection.is_open:
+                connection.close()
+        return drained
+
+    def close(self):
+        self.publisher.close()
+
+class RedisStreamClickTransport(ClickTransport):
+    """
+    Click events on Redis Streams (one per partition) read through a consumer
+    group. Publishing pipelines XADD with approximate MAXLEN trimming;
+    consumers read with XREADGROUP in batches and periodically take over
+    entries left pending by crashed consumers with XAUTOCLAIM.
+    """
+    name = "redis"
+
+    def __init__(self, key: str = CLICK_STREAM_KEY, group: str = CLICK_STREAM_GROUP,
+                 maxlen: int = CLICK_STREAM_MAXLEN, batch_size: int = CLICK_BATCH_SIZE,
+                 batch_wait: float = CLICK_BATCH_WAIT, reclaim_idle_ms: int = CLICK_RECLAIM_IDLE_MS,
+                 client: redis.Redis = None, **kwargs):
+        kwargs.setdefault("batching", AdaptiveBatchSize(initial=batch_size, minimum=min(CLICK_BATCH_MIN, batch_size)))
+        super().__init__(**kwargs)
+        self.key = key
+        self.group = group
+        self.maxlen = maxlen
+        self.batch_wait = batch_wait
+        self.reclaim_idle_ms = reclaim_idle_ms
+        self.consumer = f"{socket.gethostname()}-{os.getpid()}"
+        # Cliente próprio: o XREADGROUP bloqueia por mais tempo que o timeout do cliente de cache.
+        self.client = client or redis.Redis(
+            host=REDIS_HOST, port=REDIS_PORT, db=0, decode_responses=True,
+            socket_connect_timeout=5, socket_timeout=batch_wait + 5
         )
-        connection.close()
-        return True
-    except Exception as e:
-        log.error(f"Failed to publish to RabbitMQ exchange '{exchange_name}'. Error: {e}")
-        return False
\ No newline at end of file
+
+    @property
+    def stream(self) -> str:
+        """Stream of the partition this consumer reads."""
+        return partition_name(self.key, self.partition, self.partitioner.partitions)
+
+    def publish_clicks(self, short_codes: List[str]):
+        partitions = self.partitioner.partitions
+        with redis_breaker.guard():
+            pipe = self.client.pipeline(transaction=False)
+            for partition, codes in self.partitioner.split(short_codes).items():
+                key = partition_name(self.key, partition, partitions)
+                for short_code in codes:
+                    pipe.xadd(key, {"c": short_code}, maxlen=self.maxlen, approximate=True)
+            pipe.execute()
+
+    def _ensure_group(self, stream: str = None):
+        try:
+            self.client.xgroup_create(stream or self.stream, self.group, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def _handle(self, entries, handle_batch: ClickHandler, stream: str = None):
+        ids = [entry_id for entry_id, _ in entries]
+        # Entradas já cortadas pelo MAXLEN chegam sem campos.
+        short_codes = [fields["c"] for _, fields in entries if fields and "c" in fields]
+        if short_codes:
+            self._apply(handle_batch, short_codes)
+        if ids:
+            self.client.xack(stream or self.stream, self.group, *ids)
+
+    def reclaim(self, handle_batch: ClickHandler, stream: str = None) -> int:
+        """Processes entries another consumer read but never acknowledged."""
+        stream = stream or self.stream
+        reclaimed, start = 0, "0-0"
+        while True:
+            result = self.client.xautoclaim(
+                stream, self.group, self.consumer,
+                min_idle_time=self.reclaim_idle_ms, start_id=start, count=self.batching.size
+            )
+            start, entries = result[0], result[1]
+            if entries:
+                self._handle(entries, handle_batch, stream)
+                reclaimed += len(entries)
+            if start == "0-0":
+                return reclaimed
+
+    def drain_stale_partitions(self, handle_batch: ClickHandler) -> int:
+        drained = 0
+        for stream in stale_partition_names(self.key, self.partitioner.partitions):
+            # Sem o EXISTS, o XGROUP CREATE ... MKSTREAM criaria streams vazios para todos os nomes.
+            if self.stopped or not self.client.exists(stream):
+                continue
+            self._ensure_group(stream)
+            # Pendências de consumidores parados e depois o que nunca foi entregue (XREADGROUP sem BLOCK).
+            drained += self.reclaim(handle_batch, stream)
+            while not self.stopped:
+                response = self.client.xreadgroup(
+                    self.group, self.consumer, {stream: ">"}, count=self.batching.size, block=None
+                )
+                entries = [entry for _, stream_entries in response or [] for entry in stream_entries]
+                if not entries:
+                    break
+                self._handle(entries, handle_batch, stream)
+                drained += len(entries)
+        return drained
+
+    def consume(self, handle_batch: ClickHandler):
+        self._ensure_group()
+        next_reclaim = 0.0
+        while not self.stopped:
+            if time.monotonic() >= next_reclaim:
+                reclaimed = self.reclaim(handle_batch)
+                if reclaimed:
+                    log.warning(f"Reclaimed {reclaimed} pending click events from stalled consumers.")
+                next_reclaim = time.monotonic() + self.reclaim_idle_ms / 1000
+            response = self.client.xreadgroup(
+                self.group, self.consumer, {self.stream: ">"},
+                count=self.batching.size, block=int(self.batch_wait * 1000)
+            )
+            for _, entries in response or []:
+                self._handle(entries, handle_batch)
+
+    def close(self):
+        self.client.close()
+
+CLICK_TRANSPORTS = {
+    AmqpClickTransport.name: AmqpClickTransport,
+    RedisStreamClickTransport.name: RedisStreamClickTransport,
+}
+
+def get_click_transport(name: str = CLICK_TRANSPORT, **kwargs) -> ClickTransport:
+    """
+    Builds the click transport selected by CLICK_TRANSPORT ("amqp" or "redis").
+    Keyword arguments (e.g. `partition`) are passed to the transport.
+    """
+    if name not in CLICK_TRANSPORTS:
+        raise ValueError(f"Unknown CLICK_TRANSPORT '{name}'. Expected one of: {', '.join(CLICK_TRANSPORTS)}")
+    return CLICK_TRANSPORTS[name](**kwargs)
@@ -0,0 +1,113 @@
+# Backend/core/outbox.py
+"""
+Outbox for events bound to RabbitMQ.
+
+Request handlers never talk to the broker. Events produced by a write are
+stored as `outbox_events` rows in the same database transaction (and on the
+same shard) as the data they describe. Events produced on read paths, such as
+clicks, are appended to a local append-only log instead, so a redirect costs
+one small append to a file. outbox_relay.py drains both into RabbitMQ in batches,
+each committed as one AMQP transaction, and only then deletes them, so
+delivery is at-least-once.
+
+The local log is split into time-based segments (one file per process and
+window). A segment is only drained once its window has closed, so the relay
+never reads a file that is still being written.
+"""
+import glob
+import json
+import os
+import threading
+import time
+from typing import Iterator, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from .config import CLICK_QUEUE_NAME, settings
+from .logger import log
+
+OUTBOX_DIR = settings.outbox_dir
+OUTBOX_SEGMENT_SECONDS = settings.outbox_segment_seconds
+
+# (exchange, routing_key, body)
+Event = Tuple[str, str, str]
+
+
+def add_outbox_event(db: Session, exchange: str, body: str, routing_key: str = "", shard_key: Optional[str] = None):
+    """
+    Stages an event in the caller's transaction. It is only published if
+    the transaction commits. `shard_key` keeps the row on the same shard as
+    the URL it refers to.
+    """
+    # Import tardio: models importa database, que importa o pacote core.
+    from Backend.models.models import OutboxEvent
+
+    db.add(OutboxEvent(exchange=exchange, routing_key=routing_key, body=body, shard_key=shard_key))
+
+
+class EventLog:
+    """
+    Per-process append-only event log on the local disk.
+    Thread-safe; lines are written unbuffered with O_APPEND.
+    """
+
+    def __init__(self, directory: str = OUTBOX_DIR, segment_seconds: int = OUTBOX_SEGMENT_SECONDS):
+        self.directory = directory
+        self.segment_seconds = segment_seconds
+        self._lock = threading.Lock()
+        self._fd: Optional[int] = None
+        self._path: Optional[str] = None
+
+    def _current_segment(self) -> int:
+        return int(time.time() // self.segment_seconds)
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"events-{segment:012d}-{os.getpid()}.log")
+
+    def append(self, exchange: str, body: str, routing_key: str = ""):
+        """Appends one event to the current segment."""
+        line = (json.dumps([exchange, routing_key, body], ensure_ascii=False) + "\n").encode("utf-8")
+        path = self._segment_path(self._current_segment())
+        with self._lock:
+            if path != self._path:
+                if self._fd is not None:
+                    os.close(self._fd)
+                os.makedirs(self.directory, exist_ok=True)
+                self._fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+                self._path = path
+            os.write(self._fd, line)
+
+    def closed_segments(self) -> List[str]:
+        """Segments from every process whose time window is over, oldest first."""
+        # Uma janela inteira de folga: nenhum processo escreve mais nesses arquivos.
+        current = self._current_segment()
+        closed = []
+        for path in glob.glob(os.path.join(self.directory, "events-*.log")):
+            try:
+                segment = int(os.path.basename(path).split("-")[1])
+            except (IndexError, ValueError):
+                continue
+            if segment < current - 1:
+                closed.append(path)
+        return sorted(closed)
+
+    @staticmethod
+    def read_segment(path: str) -> Iterator[Event]:
+        """Yields the events stored in a segment, skipping torn lines."""
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    exchange, routing_key, body = json.loads(line)
+                except ValueError:
+                    log.warning(f"Skipping corrupted line in outbox segment '{path}'.")
+                    continue
+                yield exchange, routing_key, body
+
+
+event_log = EventLog()
+
+def queue_event(exchange: str, body: str, routing_key: str = ""):
+    """Queues an event produced outside of a database transaction."""
+    event_log.append(exchange, body, routing_key)
+
+def queue_click_event(short_code: str):
+    """Queues a click event for the queue consumed by worker.py."""
+    event_log.append(exchange="", body=short_code, routing_key=CLICK_QUEUE_NAME)
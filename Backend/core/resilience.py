@@ -0,0 +1,184 @@
+# Backend/core/resilience.py
+"""
+Circuit breakers for the external dependencies (Redis, RabbitMQ, Postgres).
+
+Every process keeps one breaker per dependency. After `failure_threshold`
+consecutive failures the breaker opens and calls are rejected immediately
+with CircuitOpenError, so an outage costs nothing instead of a connect
+timeout per request. Once `reset_timeout` seconds have passed the breaker
+goes half-open and lets a few probe calls through: a success closes it,
+and a failure opens it again for another period.
+
+Callers decide the fallback: the Bloom filter answers "maybe" (the
+database is queried instead), the outbox keeps buffering events, and
+redirects are served from the snapshot.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Tuple, Type
+from redis import RedisError
+from sqlalchemy.exc import InterfaceError, OperationalError, TimeoutError as PoolTimeoutError
+from .config import settings
+from .logger import log
+
+BREAKER_FAILURE_THRESHOLD = settings.breaker_failure_threshold
+BREAKER_RESET_TIMEOUT = settings.breaker_reset_timeout
+BREAKER_HALF_OPEN_CALLS = settings.breaker_half_open_calls
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+# Valor numérico de cada estado na métrica Prometheus.
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose breaker is open."""
+
+    def __init__(self, name: str):
+        super().__init__(f"Circuit breaker '{name}' is open")
+        self.name = name
+
+
+class CircuitBreaker:
+    """
+    Thread-safe closed / open / half-open circuit breaker.
+    Only exceptions in `failure_exceptions` count as failures; anything else
+    (e.g. an IntegrityError) means the dependency answered.
+    """
+
+    def __init__(self, name: str, failure_exceptions: Tuple[Type[BaseException], ...] = (Exception,),
+                 failure_threshold: int = BREAKER_FAILURE_THRESHOLD, reset_timeout: float = BREAKER_RESET_TIMEOUT,
+                 half_open_calls: int = BREAKER_HALF_OPEN_CALLS, clock=time.monotonic):
+        self.name = name
+        self.failure_exceptions = failure_exceptions
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Closes the breaker and clears its counters."""
+        with self._lock:
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self.opened_at = 0.0
+            self._probes = 0
+            self.failures_total = 0
+            self.rejected_total = 0
+            self.opened_total = 0
+
+    def _open(self):
+        if self.state != OPEN:
+            self.opened_total += 1
+            log.warning(f"Circuit breaker '{self.name}' opened after {self.consecutive_failures} failures.")
+        self.state = OPEN
+        self.opened_at = self.clock()
+        self._probes = 0
+
+    def allow(self) -> bool:
+        """
+        Returns whether a call may go through now. In half-open state each
+        allowed call is a probe and must be followed by record_success() or
+        record_failure().
+        """
+        with self._lock:
+            if self.state == OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._probes = 0
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and self._probes < self.half_open_calls:
+                self._probes += 1
+                return True
+            self.rejected_total += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                log.info(f"Circuit breaker '{self.name}' closed: dependency is back.")
+            self.state = CLOSED
+            self.consecutive_failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures_total += 1
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self._open()
+
+    @contextmanager
+    def guard(self):
+        """
+        Runs the block through the breaker:
+
+            with redis_breaker.guard():
+                client.get(key)
+
+        Raises CircuitOpenError without running the block while open.
+        """
+        if not self.allow():
+            raise CircuitOpenError(self.name)
+        try:
+            yield
+        except self.failure_exceptions:
+            self.record_failure()
+            raise
+        except BaseException:
+            self.record_success()
+            raise
+        self.record_success()
+
+    def snapshot(self) -> dict:
+        """Current state and counters, for /health and /metrics."""
+        with self._lock:
+            state = self.state
+            if state == OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+                state = HALF_OPEN
+            return {
+                "state": state,
+                "consecutive_failures": self.consecutive_failures,
+                "failures_total": self.failures_total,
+                "rejected_total": self.rejected_total,
+                "opened_total": self.opened_total,
+            }
+
+
+redis_breaker = CircuitBreaker("redis", failure_exceptions=(RedisError,))
+rabbitmq_breaker = CircuitBreaker("rabbitmq")
+postgres_breaker = CircuitBreaker("postgres", failure_exceptions=(OperationalError, InterfaceError, PoolTimeoutError))
+
+breakers: Dict[str, CircuitBreaker] = {
+    breaker.name: breaker for breaker in (redis_breaker, rabbitmq_breaker, postgres_breaker)
+}
+
+
+def health_report() -> dict:
+    """Breaker state per dependency; "degraded" while any breaker is not closed."""
+    dependencies = {name: breaker.snapshot()["state"] for name, breaker in breakers.items()}
+    status = "ok" if all(state == CLOSED for state in dependencies.values()) else "degraded"
+    return {"status": status, "dependencies": dependencies}
+
+
+def render_metrics() -> str:
+    """Breaker state and counters in the Prometheus text exposition format."""
+    snapshots = {name: breaker.snapshot() for name, breaker in breakers.items()}
+    metrics = [
+        ("circuit_breaker_state", "gauge", "Breaker state (0 closed, 1 half-open, 2 open).",
+         lambda s: STATE_VALUES[s["state"]]),
+        ("circuit_breaker_failures_total", "counter", "Calls that failed.", lambda s: s["failures_total"]),
+        ("circuit_breaker_rejected_total", "counter", "Calls rejected while open.", lambda s: s["rejected_total"]),
+        ("circuit_breaker_opened_total", "counter", "Times the breaker opened.", lambda s: s["opened_total"]),
+    ]
+    lines = []
+    for metric, kind, help_text, value in metrics:
+        lines.append(f"# HELP nytheris_{metric} {help_text}")
+        lines.append(f"# TYPE nytheris_{metric} {kind}")
+        for name, snapshot in snapshots.items():
+            lines.append(f'nytheris_{metric}{{dependency="{name}"}} {value(snapshot)}')
+    return "\n".join(lines) + "\n"
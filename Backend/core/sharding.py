@@ -0,0 +1,151 @@
+# Backend/core/sharding.py
+"""
+Shard routing for the `urls` table.
+
+Rows are placed on one of N databases by consistent hashing of their
+`short_code`. The router plugs into SQLAlchemy's `ShardedSession`, so the
+rest of the application keeps using ordinary `Session` queries: a query
+filtering on `short_code` goes to a single shard, anything else fans out.
+"""
+import bisect
+import hashlib
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter, BooleanClauseList
+
+SHARD_KEY_TABLE = "urls"
+SHARD_KEY_COLUMN = "short_code"
+DEFAULT_VNODES = 128
+
+
+def _hash(key: str) -> int:
+    """Stable 64-bit hash (Python's hash() is salted per process)."""
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """
+    Consistent hash ring with virtual nodes.
+    Adding a shard only moves roughly 1/N of the keys to the new shard.
+    """
+
+    def __init__(self, shard_ids: Iterable[str], vnodes: int = DEFAULT_VNODES):
+        self.shard_ids = list(shard_ids)
+        if not self.shard_ids:
+            raise ValueError("HashRing needs at least one shard")
+        points = sorted(
+            (_hash(f"{shard_id}#{i}"), shard_id)
+            for shard_id in self.shard_ids
+            for i in range(vnodes)
+        )
+        self._keys = [point for point, _ in points]
+        self._owners = [shard_id for _, shard_id in points]
+
+    def get(self, key: str) -> str:
+        """Returns the shard that owns the given key."""
+        index = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._owners[index]
+
+
+def _is_shard_key_column(element) -> bool:
+    table = getattr(element, "table", None)
+    return (
+        table is not None
+        and getattr(table, "name", None) == SHARD_KEY_TABLE
+        and getattr(element, "name", None) == SHARD_KEY_COLUMN
+    )
+
+
+def _comparison_codes(binary: BinaryExpression) -> Optional[List[str]]:
+    left, right = binary.left, binary.right
+    if _is_shard_key_column(right):
+        left, right = right, left
+    if not _is_shard_key_column(left) or not isinstance(right, BindParameter):
+        return None
+    value = right.effective_value
+    if binary.operator is operators.eq:
+        return [value]
+    if binary.operator is operators.in_op:
+        return list(value)
+    return None
+
+
+def short_codes_in(clause) -> List[str]:
+    """
+    Extracts the short codes a WHERE clause is restricted to.
+    Only top-level AND terms are considered, so an OR never narrows the
+    shards a query is sent to. Returns an empty list when unrestricted.
+    """
+    if clause is None:
+        return []
+    if isinstance(clause, BooleanClauseList) and clause.operator is operators.and_:
+        terms = clause.clauses
+    else:
+        terms = [clause]
+    for term in terms:
+        if isinstance(term, BinaryExpression):
+            codes = _comparison_codes(term)
+            if codes is not None:
+                return codes
+    return []
+
+
+class ShardRouter:
+    """
+    Maps short codes to shard engines and provides the chooser callbacks
+    expected by `sqlalchemy.ext.horizontal_shard.ShardedSession`.
+    """
+
+    def __init__(self, engines: Dict[str, object], vnodes: int = DEFAULT_VNODES, fanout_reads: bool = False):
+        self.engines = dict(engines)
+        self.ring = HashRing(self.engines, vnodes=vnodes)
+        self.default_shard = next(iter(self.engines))
+        # Durante um rebalanceamento a linha pode ainda estar no shard antigo: leituras e
+        # UPDATE/DELETE por short_code vão para todos os shards (ver execute_chooser).
+        self.fanout_reads = fanout_reads
+
+    def shard_for(self, short_code: str) -> str:
+        """Returns the id of the shard that owns `short_code`."""
+        return self.ring.get(short_code)
+
+    def shard_chooser(self, mapper, instance, clause=None):
+        short_code = None
+        if instance is not None:
+            # Outras tabelas (ex.: outbox_events) indicam o short_code dono em `shard_key`.
+            short_code = getattr(instance, SHARD_KEY_COLUMN, None) or getattr(instance, "shard_key", None)
+        if short_code:
+            return self.shard_for(short_code)
+        codes = short_codes_in(clause)
+        if codes:
+            return self.shard_for(codes[0])
+        return self.default_shard
+
+    def identity_chooser(self, mapper, primary_key, *, lazy_loaded_from, execution_options, bind_arguments, **kw):
+        if lazy_loaded_from is not None:
+            return [lazy_loaded_from.identity_token]
+        # Chaves primárias são locais a cada shard; não há como saber onde está.
+        return list(self.engines)
+
+    def execute_chooser(self, orm_context):
+        if orm_context.is_select and self.fanout_reads:
+            return list(self.engines)
+        codes = short_codes_in(getattr(orm_context.statement, "whereclause", None))
+        if not codes:
+            return list(self.engines)
+        owners = sorted({self.shard_for(code) for code in codes})
+        if self.fanout_reads and (orm_context.is_update or orm_context.is_delete):
+            # A linha ainda pode estar no shard antigo. O dono novo vem por último: o
+            # rebalance_shards.py copia a linha antes de apagá-la da origem (com a linha travada),
+            # então um UPDATE que esperou por esse lock na origem já encontra a cópia no destino.
+            return [shard_id for shard_id in self.engines if shard_id not in owners] + owners
+        return owners
+
+    def session_options(self) -> dict:
+        """Keyword arguments for `sessionmaker(class_=ShardedSession, ...)`."""
+        return {
+            "shards": self.engines,
+            "shard_chooser": self.shard_chooser,
+            "identity_chooser": self.identity_chooser,
+            "execute_chooser": self.execute_chooser,
+        }
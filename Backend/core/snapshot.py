@@ -0,0 +1,257 @@
+# Backend/core/snapshot.py
+"""
+Memory-mapped redirect snapshot.
+
+A background job periodically exports every active `short_code -> original_url`
+mapping into one sorted binary file. Each API worker maps that file with mmap
+(the OS page cache shares it between processes) and resolves codes with a
+binary search, without touching Redis or Postgres. The file is replaced
+atomically, and readers pick up the new version on their next lookup.
+
+File layout (little-endian):
+    header   MAGIC (8 bytes) | record count (uint64) | index offset (uint64)
+    records  code length (uint16) | flags (uint8) | cache max-age (uint32) | url length (uint32) | code | url
+    index    one uint64 absolute record offset per record, sorted by short_code
+
+The cache max-age of a record only counts when FLAG_HAS_MAX_AGE is set (or
+it is non-zero), so an explicit max-age of 0 stays apart from "unset".
+
+Offsets are 64-bit, so the file has no size limit of its own. The index
+comes last so the exporter can stream rows sorted by the database straight
+into the file without knowing the record count in advance.
+"""
+import heapq
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import time
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+from sqlalchemy.ext.horizontal_shard import set_shard_id
+from .config import settings
+from .logger import log
+
+SNAPSHOT_PATH = settings.snapshot_path
+SNAPSHOT_RELOAD_INTERVAL = settings.snapshot_reload_interval
+
+MAGIC = b"NYSNAP03"
+HEADER = struct.Struct("<8sQQ")
+OFFSET = struct.Struct("<Q")
+RECORD = struct.Struct("<HBII")
+
+FLAG_PASSWORD = 1
+FLAG_CLICK_LIMIT = 2
+FLAG_PERMANENT = 4
+FLAG_HAS_MAX_AGE = 8
+FLAG_BEACON_CLICKS = 16
+
+
+class SnapshotEntry(NamedTuple):
+    """A redirect as stored in the snapshot."""
+    original_url: str
+    flags: int
+    cache_max_age: Optional[int] = None
+
+    @property
+    def password_protected(self) -> bool:
+        return bool(self.flags & FLAG_PASSWORD)
+
+    @property
+    def click_limited(self) -> bool:
+        return bool(self.flags & FLAG_CLICK_LIMIT)
+
+    @property
+    def permanent(self) -> bool:
+        return bool(self.flags & FLAG_PERMANENT)
+
+    @property
+    def beacon_clicks(self) -> bool:
+        return bool(self.flags & FLAG_BEACON_CLICKS)
+
+
+def write_sorted_snapshot(path: str, entries: Iterable[Tuple[str, str, int, int]]) -> int:
+    """
+    Streams (short_code, original_url, flags, cache_max_age) entries, already
+    sorted by the UTF-8 bytes of short_code, into `path` atomically. Memory
+    use does not depend on the number of entries: the index is spooled to a
+    temporary file and appended after the records. A repeated code (a row
+    seen on two shards in the middle of a rebalance) keeps its first entry;
+    out-of-order input raises ValueError. The file is written next to the
+    target and renamed over it, so readers only ever see a complete snapshot.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+
+    count = 0
+    previous = None
+    try:
+        with open(tmp_path, "wb") as f, tempfile.TemporaryFile(dir=directory) as index:
+            f.write(HEADER.pack(MAGIC, 0, 0))
+            offset = HEADER.size
+            for code, url, flags, max_age in entries:
+                code_bytes, url_bytes = code.encode("utf-8"), url.encode("utf-8")
+                if previous is not None and code_bytes <= previous:
+                    if code_bytes == previous:
+                        continue
+                    raise ValueError(f"snapshot entries are not sorted: {code!r} after {previous!r}")
+                previous = code_bytes
+                index.write(OFFSET.pack(offset))
+                f.write(RECORD.pack(len(code_bytes), flags, max_age or 0, len(url_bytes)))
+                f.write(code_bytes)
+                f.write(url_bytes)
+                offset += RECORD.size + len(code_bytes) + len(url_bytes)
+                count += 1
+            index.seek(0)
+            shutil.copyfileobj(index, f)
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, count, offset))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return count
+
+
+def write_snapshot(path: str, entries: Iterable[Tuple[str, str, int, int]]) -> int:
+    """
+    Writes (short_code, original_url, flags, cache_max_age) entries in any
+    order. Sorts them in memory: meant for small inputs and tests; the
+    exporter streams pre-sorted rows through write_sorted_snapshot().
+    """
+    return write_sorted_snapshot(path, sorted(entries, key=lambda entry: entry[0].encode("utf-8")))
+
+
+def _sorted_rows(db, batch_size: int, shard_id: Optional[str] = None):
+    """Active URLs of one shard (or of the whole session), ordered by short_code in byte order."""
+    # Import tardio: models importa database, que não deve depender deste módulo.
+    from Backend.models.models import URL
+
+    bind = db.get_bind(shard_id=shard_id) if shard_id is not None else db.get_bind()
+    # O Postgres ordena pela collation do banco; "C" compara bytes, como a busca binária do leitor.
+    order = URL.short_code.collate("C") if bind.dialect.name == "postgresql" else URL.short_code
+    query = db.query(
+        URL.short_code, URL.original_url, URL.password, URL.max_clicks, URL.current_clicks,
+        URL.redirect_policy, URL.cache_max_age, URL.click_counting
+    ).order_by(order)
+    if shard_id is not None:
+        query = query.options(set_shard_id(shard_id))
+    rows = query.yield_per(batch_size)
+    for short_code, original_url, password, max_clicks, current_clicks, policy, max_age, counting in rows:
+        if max_clicks and current_clicks >= max_clicks:
+            continue
+        flags = 0
+        if password:
+            flags |= FLAG_PASSWORD
+        if max_clicks:
+            flags |= FLAG_CLICK_LIMIT
+        if policy == "permanent":
+            flags |= FLAG_PERMANENT
+        if max_age is not None:
+            flags |= FLAG_HAS_MAX_AGE
+        if counting == "beacon":
+            flags |= FLAG_BEACON_CLICKS
+        yield short_code, original_url, flags, max_age
+
+
+def export_snapshot(session_factory, path: str = SNAPSHOT_PATH, batch_size: int = 10000,
+                    shard_ids: Optional[List[str]] = None) -> int:
+    """
+    Streams every active URL from the database into a new snapshot file.
+    Expired links (click limit reached) are left out. With `shard_ids`, each
+    shard is read in short_code order by the database and the streams are
+    merged, so the table is never held in memory.
+    """
+    sessions = [session_factory() for _ in (shard_ids or [None])]
+    try:
+        streams = [
+            _sorted_rows(db, batch_size, shard_id) for db, shard_id in zip(sessions, shard_ids or [None])
+        ]
+        merged = heapq.merge(*streams, key=lambda entry: entry[0].encode("utf-8"))
+        return write_sorted_snapshot(path, merged)
+    finally:
+        for db in sessions:
+            db.close()
+
+
+class RedirectSnapshot:
+    """
+    Read-only view over a snapshot file.
+    Safe to share between the threads of a worker; the file is re-mapped
+    when the exporter replaces it.
+    """
+
+    def __init__(self, path: str = SNAPSHOT_PATH, reload_interval: float = SNAPSHOT_RELOAD_INTERVAL):
+        self.path = path
+        self.reload_interval = reload_interval
+        # (mmap, record count, index offset), trocados juntos numa única atribuição.
+        self._view: Optional[Tuple[mmap.mmap, int, int]] = None
+        self._file_id = None
+        self._next_check = 0.0
+
+    def __len__(self) -> int:
+        self._maybe_reload()
+        return self._view[1] if self._view else 0
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.reload_interval
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        file_id = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if file_id == self._file_id:
+            return
+        try:
+            with open(self.path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, count, index_offset = HEADER.unpack_from(mm, 0)
+            if magic != MAGIC:
+                raise ValueError(f"unexpected magic {magic!r}")
+        except (OSError, ValueError, struct.error) as e:
+            log.error(f"Failed to load redirect snapshot '{self.path}'. Error: {e}")
+            return
+        # O mmap antigo não é fechado aqui: buscas em andamento ainda o referenciam.
+        self._view, self._file_id = (mm, count, index_offset), file_id
+        log.info(f"Loaded redirect snapshot '{self.path}' with {count} entries.")
+
+    def lookup(self, short_code: str) -> Optional[SnapshotEntry]:
+        """Binary-searches the snapshot for `short_code`."""
+        self._maybe_reload()
+        view = self._view
+        if view is None:
+            return None
+        mm, count, index_offset = view
+
+        key = short_code.encode("utf-8")
+        low, high = 0, count - 1
+        while low <= high:
+            middle = (low + high) // 2
+            (offset,) = OFFSET.unpack_from(mm, index_offset + OFFSET.size * middle)
+            code_len, flags, max_age, url_len = RECORD.unpack_from(mm, offset)
+            start = offset + RECORD.size
+            code = mm[start:start + code_len]
+            if code < key:
+                low = middle + 1
+            elif code > key:
+                high = middle - 1
+            else:
+                url_start = start + code_len
+                if not (flags & FLAG_HAS_MAX_AGE or max_age):
+                    max_age = None
+                return SnapshotEntry(mm[url_start:url_start + url_len].decode("utf-8"), flags, max_age)
+        return None
+
+
+redirect_snapshot = RedirectSnapshot()
+
+def get_snapshot() -> RedirectSnapshot:
+    """Dependency function to get the shared redirect snapshot."""
+    return redirect_snapshot
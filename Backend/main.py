@@ -2,16 +2,39 @@
 Main Application File.
 This file initializes the FastAPI application, includes the API routers,
 and configures CORS middleware.
+
+Importing it opens no connection: the database engines, the Redis client and
+the Bloom filter are created on the first request that needs them, and the
+lifespan handler closes them on shutdown.
 """
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware # <-- 1. Adicione este import
+from fastapi.responses import PlainTextResponse
 from Backend.routes import url as url_router
+from Backend.core.bloom import get_bloom_filter
+from Backend.core.cache import close_cache
+from Backend.core.database import dispose_engines
+from Backend.core.logger import flush_logs, install_reload_handler, log
+from Backend.core.resilience import health_report, render_metrics
+
+# --- Lifecycle ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Nothing is opened at startup; shutdown releases whatever was created lazily."""
+    install_reload_handler()
+    yield
+    log.info("Shutting down: closing database and Redis connections.")
+    dispose_engines()
+    close_cache()
+    flush_logs()
 
 # --- App Initialization ---
 app = FastAPI(
     title="Encurtador de Links",
     description="Projeto moderno para encurtar links com FastAPI.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # --- CORS Middleware Configuration ---
@@ -35,4 +58,23 @@ app.include_router(url_router.router)
 @app.get("/", tags=["Root"])
 def read_root():
     """Welcome endpoint."""
-    return {"message": "Welcome to the URL Shortener API!"}
\ No newline at end of file
+    return {"message": "Welcome to the URL Shortener API!"}
+
+# --- Monitoring Endpoints ---
+@app.get("/stats/bloom", tags=["Monitoring"])
+def bloom_filter_stats():
+    """Sizing and false-positive rate of the short code Bloom filter."""
+    return get_bloom_filter().stats()
+
+@app.get("/health", tags=["Monitoring"])
+def health():
+    """
+    Circuit breaker state of each dependency as seen by this process.
+    "degraded" means redirects are being served through a fallback.
+    """
+    return health_report()
+
+@app.get("/metrics", tags=["Monitoring"], response_class=PlainTextResponse)
+def metrics():
+    """Circuit breaker metrics in the Prometheus text format."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
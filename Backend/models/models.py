@@ -1,24 +1,13 @@
 """
-Pydantic Models for Data Validation.
+SQLAlchemy ORM Models.
 
-This module defines the pydantic models that are used for request and response data validation throunghout the application.
+This module defines the database tables. The pydantic models used for request
+validation live in schemas.py, so processes that only touch the database
+(worker, relay, exporter) do not import pydantic.
 """
-from pydantic import BaseModel, Field
-from typing import Optional
-from sqlalchemy import Column, Integer, String, DateTime, func, Index
+from sqlalchemy import Column, Integer, String, Text, DateTime, func, Index
 from Backend.core.database import Base
 
-class URLBase(BaseModel):
-    """
-    Base Model for a URL.
-    Atributes:
-        url(str): The URL to be processed.
-    """
-    url: str
-    password: Optional[str] = None
-    max_clicks: Optional[int] = 0
-    custom_alias: Optional[str] = Field(None, max_length=30, pattern=r'^[a-zA-Z0-9_-]+$')
-    
 class URL(Base):
     """
     SQLAlchemy ORM model for a shortened URL.
@@ -28,15 +17,33 @@ class URL(Base):
     id = Column(Integer, primary_key=True, index=True)
     short_code = Column(String, unique=True, index=True, nullable=False)
     original_url = Column(String, nullable=False)
+    # SHA-256 do destino normalizado (Backend/core/dedup.py), usado na deduplicação.
+    original_url_hash = Column(String(64), nullable=True, index=True)
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
     password = Column(String, nullable=True)
     max_clicks = Column(Integer, default=0)
     current_clicks = Column(Integer, default=0, nullable=False)
+    redirect_policy = Column(String, default="temporary", server_default="temporary", nullable=False)
+    cache_max_age = Column(Integer, nullable=True)
+    # "origin": conta cada acesso que chega ao servidor; "beacon": só o endpoint de beacon conta (links permanentes)
+    click_counting = Column(String, default="origin", server_default="origin", nullable=False)
     
 # Adiciona um índice explícito para a coluna short_code para otimizar buscas.
 Index("ix_urls_short_code", "short_code", unique=True)
 
 
-class URLPasswordRequest(BaseModel):
-    """Model for the password submission request."""
-    password: str
\ No newline at end of file
+class OutboxEvent(Base):
+    """
+    SQLAlchemy ORM model for an event waiting to be relayed to RabbitMQ.
+    Rows are written in the same transaction as the change they describe.
+    """
+    __tablename__="outbox_events"
+
+    id = Column(Integer, primary_key=True)
+    exchange = Column(String, nullable=False)
+    routing_key = Column(String, nullable=False, default="")
+    body = Column(Text, nullable=False)
+    # short_code relacionado: mantém o evento no mesmo shard (e transação) da URL.
+    shard_key = Column(String, nullable=True)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+
@@ -0,0 +1,30 @@
+"""
+Pydantic Models for Data Validation.
+
+This module defines the pydantic models that are used for request and response data validation throunghout the application.
+"""
+from pydantic import BaseModel, Field
+from typing import Optional
+
+class URLBase(BaseModel):
+    """
+    Base Model for a URL.
+    Atributes:
+        url(str): The URL to be processed.
+    """
+    url: str
+    password: Optional[str] = None
+    max_clicks: Optional[int] = 0
+    custom_alias: Optional[str] = Field(None, max_length=30, pattern=r'^[a-zA-Z0-9_-]+$')
+    # "permanent": 301 cacheável por navegadores/CDNs (apenas links sem senha e sem limite de cliques)
+    redirect_policy: Optional[str] = Field("temporary", pattern=r'^(temporary|permanent)$')
+    cache_max_age: Optional[int] = Field(None, ge=0, le=31536000)
+    # "beacon": cliques contados só via POST /beacon (apenas links permanentes); "origin" conta os acessos ao servidor
+    click_counting: Optional[str] = Field("origin", pattern=r'^(origin|beacon)$')
+    # Reaproveita o código de um link público já existente para o mesmo destino
+    deduplicate: Optional[bool] = False
+
+
+class URLPasswordRequest(BaseModel):
+    """Model for the password submission request."""
+    password: str
@@ -2,110 +2,339 @@
 
 import secrets
 import string
-from fastapi import APIRouter, HTTPException, status, Depends
-from fastapi.responses import RedirectResponse
+from typing import Optional
+from fastapi import APIRouter, HTTPException, status, Depends, Header
+from fastapi.responses import JSONResponse, RedirectResponse, Response
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from redis import Redis
 
 # Importa as classes necessárias diretamente do seu arquivo de modelos
-from Backend.models.models import URL, URLBase, URLPasswordRequest
+from Backend.models.models import URL
+from Backend.models.schemas import URLBase, URLPasswordRequest
 from Backend.core.database import get_db
 from Backend.core.cache import get_cache
-from Backend.core.logger import log
+from Backend.core.config import settings
+from Backend.core.logger import log, hot_log
 from Backend.core import security
-from Backend.core.messaging import publish_message
-from Backend.core.alerter import send_alert
+from Backend.core.outbox import queue_click_event
+from Backend.core.alerter import enqueue_alert, queue_alert
+from Backend.core.snapshot import RedirectSnapshot, get_snapshot
+from Backend.core.bloom import ShortCodeBloomFilter, get_bloom_filter
+from Backend.core.resilience import CircuitOpenError, postgres_breaker
+from Backend.core.dedup import destination_hash, normalize_url
+from Backend.core.idempotency import (
+    MAX_KEY_LENGTH, IdempotencyInProgress, IdempotencyKeyReused, IdempotencyStore, StoredResponse,
+    get_idempotency_store
+)
 
 router = APIRouter(
     tags=["URL Shortener"],
     prefix="/api/v1"
 )
 
-def generate_unique_short_code(db: Session, length: int = 7) -> str:
+BASE_URL = "http://host.docker.internal:8000"
+
+# max-age padrão (segundos) dos redirecionamentos permanentes sem cache_max_age próprio
+REDIRECT_CACHE_MAX_AGE = settings.redirect_cache_max_age
+
+def short_code_exists(db: Session, short_code: str, bloom: ShortCodeBloomFilter = None) -> bool:
+    """
+    Checks whether a short code is taken. A definite miss in the Bloom filter
+    skips the database; otherwise the lookup filters on short_code, so it only
+    touches the shard that would own the code.
+    """
+    if bloom is not None and not bloom.might_contain(short_code):
+        return False
+    return db.query(URL).filter(URL.short_code == short_code).first() is not None
+
+def generate_unique_short_code(db: Session, length: int = 7, bloom: ShortCodeBloomFilter = None) -> str:
     """
     Generates a random, unique short code by checking the database.
     """
     characters = string.ascii_letters + string.digits
     while True:
         short_code = "".join(secrets.choice(characters) for _ in range(length))
-        # Verifica no banco de dados para garantir que o código é único
-        if not db.query(URL).filter(URL.short_code == short_code).first():
+        # Verifica no filtro/banco de dados para garantir que o código é único
+        if not short_code_exists(db, short_code, bloom):
             return short_code
 
-@router.post("/shorten", status_code=status.HTTP_201_CREATED)
-def create_short_url(url_data: URLBase, db: Session = Depends(get_db)):
+def find_duplicate_short_code(db: Session, url: str, url_hash: str, redirect_policy: str, cache_max_age: int = None,
+                              click_counting: str = "origin"):
+    """
+    Returns the code of an existing public link (no password, no click
+    limit, same redirect and click counting policy) to the same destination, or None.
+    One lookup on the original_url_hash index of each shard; the stored
+    original_url of each candidate is compared too, so a stale or colliding
+    hash never hands out a link to another destination.
+    """
+    max_age_matches = URL.cache_max_age.is_(None) if cache_max_age is None else URL.cache_max_age == cache_max_age
+    candidates = (
+        db.query(URL.short_code, URL.original_url)
+        .filter(
+            URL.original_url_hash == url_hash,
+            URL.password.is_(None),
+            or_(URL.max_clicks == 0, URL.max_clicks.is_(None)),
+            URL.redirect_policy == redirect_policy,
+            URL.click_counting == click_counting,
+            max_age_matches,
+        )
+        .limit(10)
+    )
+    normalized = normalize_url(url)
+    for row in candidates:
+        if normalize_url(row.original_url) == normalized:
+            return row.short_code
+    return None
+
+def shorten(url_data: URLBase, response: Response, db: Session, bloom: ShortCodeBloomFilter) -> dict:
     """
     Creates a new shortened URL, with options for a custom alias,
-    password protection, and click limits.
+    password protection, and click limits. With `deduplicate`, a request
+    for a public link whose destination already has one returns the
+    existing code (200) instead of inserting a new row.
     """
     try:
-        short_code: str
-        if url_data.custom_alias:
-            log.info(f"Custom alias provided: '{url_data.custom_alias}'")
-            # Verifica se o apelido customizado já está em uso
-            existing_url = db.query(URL).filter(URL.short_code == url_data.custom_alias).first()
-            if existing_url:
-                log.warning(f"Custom alias '{url_data.custom_alias}' already exists.")
-                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Custom alias already in use.")
-            short_code = url_data.custom_alias
-        else:
-            # Se nenhum apelido for fornecido, gera um código aleatório
-            short_code = generate_unique_short_code(db)
-            log.info(f"Generated random short code: '{short_code}'")
-
-        hashed_password = None
-        if url_data.password:
-            hashed_password = security.hash_password(url_data.password)
-            log.info(f"Password provided for '{short_code}'. Hashing it.")
-
-        db_url = URL(
-            original_url=url_data.url,
-            short_code=short_code,
-            password=hashed_password,
-            max_clicks=url_data.max_clicks or 0
-        )
-        db.add(db_url)
-        db.commit()
-        db.refresh(db_url)
-
-        # Envia um alerta sobre a nova URL criada
-        alert_message = (
-            f"**Código:** `{short_code}`\n"
-            f"**Destino:** `{db_url.original_url}`\n"
-            f"**Expira em:** `{db_url.max_clicks or 'Nunca'}` cliques"
-        )
-        send_alert(title="✅ Nova URL Criada", message=alert_message, level="INFO")
+        # Com o Postgres fora do ar (breaker aberto) a criação falha na hora, sem esperar timeouts.
+        with postgres_breaker.guard():
+            url_hash = destination_hash(url_data.url)
+            redirect_policy = "permanent" if url_data.redirect_policy == "permanent" else "temporary"
+            click_counting = "beacon" if url_data.click_counting == "beacon" else "origin"
+            if url_data.deduplicate and not (url_data.custom_alias or url_data.password or url_data.max_clicks):
+                existing_code = find_duplicate_short_code(
+                    db, url_data.url, url_hash, redirect_policy, url_data.cache_max_age, click_counting
+                )
+                if existing_code:
+                    hot_log.info("Destination already shortened as '{}'. Reusing it.", existing_code)
+                    response.status_code = status.HTTP_200_OK
+                    return {"message": "Existing short URL returned.", "short_url": f"{BASE_URL}/r/{existing_code}"}
+
+            short_code: str
+            if url_data.custom_alias:
+                hot_log.info("Custom alias provided: '{}'", url_data.custom_alias)
+                # Verifica se o apelido customizado já está em uso
+                if short_code_exists(db, url_data.custom_alias, bloom):
+                    log.warning(f"Custom alias '{url_data.custom_alias}' already exists.")
+                    raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Custom alias already in use.")
+                short_code = url_data.custom_alias
+            else:
+                # Se nenhum apelido for fornecido, gera um código aleatório
+                short_code = generate_unique_short_code(db, bloom=bloom)
+                hot_log.info("Generated random short code: '{}'", short_code)
 
-        base_url = "http://host.docker.internal:8000"
-        shortened_url = f"{base_url}/r/{short_code}"
-        return { "message": "URL shortened successfully!", "short_url": shortened_url }
+            permanent = redirect_policy == "permanent"
+            if permanent and (url_data.password or url_data.max_clicks):
+                # Um 301 em cache nunca volta ao servidor: senha e limite de cliques deixariam de valer.
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Permanent redirects cannot be password-protected or click-limited."
+                )
+            if click_counting == "beacon" and not permanent:
+                # Links temporários sempre passam pelo servidor, que já conta o clique.
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Beacon click counting is only available for permanent redirects."
+                )
+
+            hashed_password = None
+            if url_data.password:
+                hashed_password = security.hash_password(url_data.password)
+                hot_log.info("Password provided for '{}'. Hashing it.", short_code)
+
+            db_url = URL(
+                original_url=url_data.url,
+                original_url_hash=url_hash,
+                short_code=short_code,
+                password=hashed_password,
+                max_clicks=url_data.max_clicks or 0,
+                redirect_policy=redirect_policy,
+                cache_max_age=url_data.cache_max_age,
+                click_counting=click_counting
+            )
+            db.add(db_url)
+
+            # O alerta sobre a nova URL é gravado na mesma transação (outbox) e enviado pelo relay
+            alert_message = (
+                f"**Código:** `{short_code}`\n"
+                f"**Destino:** `{db_url.original_url}`\n"
+                f"**Expira em:** `{db_url.max_clicks or 'Nunca'}` cliques"
+            )
+            enqueue_alert(db, title="✅ Nova URL Criada", message=alert_message, level="INFO", shard_key=short_code)
+
+            db.commit()
+            db.refresh(db_url)
+            bloom.add(short_code)
+
+            shortened_url = f"{BASE_URL}/r/{short_code}"
+            return { "message": "URL shortened successfully!", "short_url": shortened_url }
 
     except HTTPException as http_exc:
         # Re-levanta exceções HTTP para que o FastAPI as capture corretamente
         raise http_exc
+    except CircuitOpenError:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Service temporarily unavailable")
+    except IntegrityError:
+        # O índice único ainda é a garantia final caso dois pedidos disputem o mesmo apelido
+        db.rollback()
+        if url_data.custom_alias:
+            log.warning(f"Custom alias '{url_data.custom_alias}' was taken concurrently.")
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Custom alias already in use.")
+        log.error("Generated short code collided on insert.")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
     except Exception as e:
         log.error(f"Error creating short URL: {e}")
         db.rollback()
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
+@router.post("/shorten", status_code=status.HTTP_201_CREATED)
+def create_short_url(
+    url_data: URLBase,
+    response: Response,
+    db: Session = Depends(get_db),
+    bloom: ShortCodeBloomFilter = Depends(get_bloom_filter),
+    idempotency: IdempotencyStore = Depends(get_idempotency_store),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    """
+    Creates a new shortened URL (see shorten()). Clients that retry should
+    send an `Idempotency-Key` header: a retry with the same key and body gets
+    the original response back (marked `Idempotent-Replayed: true`) without
+    creating another link, and one that overlaps the original waits for it.
+    """
+    if not idempotency_key:
+        return shorten(url_data, response, db, bloom)
+    if len(idempotency_key) > MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters."
+        )
+
+    fingerprint = idempotency.fingerprint(url_data.model_dump(), sensitive=bool(url_data.password))
+    if fingerprint is None:
+        log.warning("Idempotency-Key ignored for a password-protected link: IDEMPOTENCY_SECRET is not set.")
+        return shorten(url_data, response, db, bloom)
+
+    try:
+        claim = idempotency.begin("shorten", idempotency_key, fingerprint)
+    except IdempotencyKeyReused:
+        log.warning("Idempotency-Key reused with a different request body.")
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used for a different request."
+        )
+    except IdempotencyInProgress:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A request with this Idempotency-Key is still in progress.",
+            headers={"Retry-After": "1"}
+        )
+
+    if isinstance(claim, StoredResponse):
+        # Replay: nada de Postgres, bcrypt ou alerta; só a resposta guardada no Redis.
+        hot_log.info("Replaying stored response ({}) for an idempotent shorten request.", claim.status_code)
+        return JSONResponse(claim.body, status_code=claim.status_code, headers={"Idempotent-Replayed": "true"})
+    if claim is None:
+        return shorten(url_data, response, db, bloom)
+
+    try:
+        result = shorten(url_data, response, db, bloom)
+    except HTTPException as http_exc:
+        # Erros do cliente se repetiriam iguais e são guardados; erros do servidor liberam a chave.
+        if http_exc.status_code < 500:
+            idempotency.complete(claim, http_exc.status_code, {"detail": http_exc.detail})
+        else:
+            idempotency.release(claim)
+        raise
+    except BaseException:
+        idempotency.release(claim)
+        raise
+    idempotency.complete(claim, response.status_code or status.HTTP_201_CREATED, result)
+    return result
+
+def redirect_with_click(
+    short_code: str, original_url: str, permanent: bool = False, cache_max_age: int = None,
+    beacon_clicks: bool = False
+) -> RedirectResponse:
+    """
+    Builds the redirect response for a link's policy and queues the click
+    event in the local outbox.
+    Permanent links answer 301 with a public Cache-Control, so browsers and
+    CDNs follow them without coming back: only cache misses reach us and
+    get counted. Links created with click_counting="beacon" skip that count
+    and rely on the beacon endpoint alone, so a page that sends beacons
+    never counts a click twice. Temporary links answer 307 with no-store.
+    """
+    if not beacon_clicks:
+        try:
+            queue_click_event(short_code)
+            hot_log.info("Click event for '{}' queued successfully.", short_code)
+        except OSError as e:
+            log.error(f"FAILED to queue click event for '{short_code}'. Error: {e}")
+
+    if permanent:
+        max_age = REDIRECT_CACHE_MAX_AGE if cache_max_age is None else cache_max_age
+        response = RedirectResponse(url=original_url, status_code=status.HTTP_301_MOVED_PERMANENTLY)
+        response.headers["Cache-Control"] = f"public, max-age={max_age}"
+        return response
+
+    response = RedirectResponse(url=original_url, status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
 @router.get("/r/{short_code}")
 def redirect_to_original_url(
     short_code: str,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    snapshot: RedirectSnapshot = Depends(get_snapshot),
+    bloom: ShortCodeBloomFilter = Depends(get_bloom_filter)
 ):
     """
     Redirects to the original URL after checking business rules.
-    On success, it publishes a click event to RabbitMQ.
+    Links without password or click limit are served straight from the
+    redirect snapshot; if the database is unavailable, any link in the
+    snapshot is served from it. Codes the Bloom filter has never seen are
+    rejected without a database query, and while the Postgres circuit
+    breaker is open the database is not tried at all. On success, it queues
+    a click event for the outbox relay, so RabbitMQ is never on the request
+    path.
     """
-    db_url = db.query(URL).filter(URL.short_code == short_code).first()
+    snapshot_entry = snapshot.lookup(short_code)
+    if snapshot_entry and not snapshot_entry.password_protected and not snapshot_entry.click_limited:
+        # Links sem senha e sem limite nunca mudam: o snapshot é suficiente.
+        return redirect_with_click(
+            short_code, snapshot_entry.original_url, snapshot_entry.permanent, snapshot_entry.cache_max_age,
+            snapshot_entry.beacon_clicks
+        )
+
+    if not snapshot_entry and not bloom.might_contain(short_code):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="URL not found")
+
+    try:
+        with postgres_breaker.guard():
+            db_url = db.query(URL).filter(URL.short_code == short_code).first()
+    except (SQLAlchemyError, CircuitOpenError) as e:
+        if not snapshot_entry:
+            log.error(f"Database unavailable and '{short_code}' is not in the snapshot. Error: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Service temporarily unavailable"
+            )
+        log.warning(f"Database unavailable, serving '{short_code}' from the redirect snapshot. Error: {e}")
+        if snapshot_entry.password_protected:
+            raise HTTPException(status_code=401, detail="Password required to access this URL")
+        return redirect_with_click(
+            short_code, snapshot_entry.original_url, snapshot_entry.permanent, snapshot_entry.cache_max_age,
+            snapshot_entry.beacon_clicks
+        )
 
     if not db_url:
+        bloom.record_false_positive()
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="URL not found")
 
     # --- LÓGICA DE VERIFICAÇÃO ---
     if db_url.max_clicks > 0 and db_url.current_clicks >= db_url.max_clicks:
         log.warning(f"URL '{short_code}' has reached its click limit.")
-        send_alert(
+        queue_alert(
             title="🚫 URL Expirada",
             message=f"O link com o código `{short_code}` atingiu o seu limite de `{db_url.max_clicks}` cliques e foi desativado.",
             level="WARNING"
@@ -113,16 +342,60 @@ def redirect_to_original_url(
         raise HTTPException(status_code=410, detail="URL has expired")
 
     if db_url.password:
-        log.warning(f"URL '{short_code}' is password protected.")
+        log.warning("URL '{}' is password protected.", short_code)
         raise HTTPException(status_code=401, detail="Password required to access this URL")
 
     # --- LÓGICA DE PUBLICAÇÃO ASSÍNCRONA ---
-    if publish_message(short_code):
-        log.info(f"Click event for '{short_code}' published successfully.")
+    return redirect_with_click(
+        short_code, db_url.original_url, db_url.redirect_policy == "permanent", db_url.cache_max_age,
+        db_url.click_counting == "beacon"
+    )
+
+
+@router.post("/beacon/{short_code}", status_code=status.HTTP_204_NO_CONTENT)
+def record_click_beacon(
+    short_code: str,
+    db: Session = Depends(get_db),
+    snapshot: RedirectSnapshot = Depends(get_snapshot),
+    bloom: ShortCodeBloomFilter = Depends(get_bloom_filter)
+):
+    """
+    Counts a click on a link whose redirect is cached by the client or a CDN.
+    Meant for navigator.sendBeacon() on the page that shows the link: it only
+    appends to the local outbox. Only permanent links created with
+    click_counting="beacon" are counted this way; every other link counts its
+    clicks on the redirect itself, so a beacon for it answers 404: the click
+    is never counted twice, and an anonymous caller cannot use up someone
+    else's click limit.
+    """
+    snapshot_entry = snapshot.lookup(short_code)
+    if snapshot_entry:
+        beacon_clicks = snapshot_entry.permanent and snapshot_entry.beacon_clicks
     else:
-        log.error(f"FAILED to publish click event for '{short_code}'.")
+        if not bloom.might_contain(short_code):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="URL not found")
+        try:
+            with postgres_breaker.guard():
+                db_url = db.query(URL).filter(URL.short_code == short_code).first()
+        except (SQLAlchemyError, CircuitOpenError) as e:
+            log.error(f"Database unavailable and '{short_code}' is not in the snapshot. Error: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Service temporarily unavailable"
+            )
+        # Links permanentes nunca têm senha nem limite (validado na criação); a checagem extra é defensiva.
+        beacon_clicks = bool(
+            db_url and db_url.redirect_policy == "permanent" and db_url.click_counting == "beacon"
+            and not db_url.password and not db_url.max_clicks
+        )
+    if not beacon_clicks:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="URL not found")
 
-    return RedirectResponse(url=db_url.original_url, status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+    try:
+        queue_click_event(short_code)
+        hot_log.info("Beacon click for '{}' queued.", short_code)
+    except OSError as e:
+        log.error(f"FAILED to queue beacon click for '{short_code}'. Error: {e}")
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
 @router.post("/verify/{short_code}", status_code=status.HTTP_200_OK)
@@ -132,7 +405,7 @@ def verify_password_and_get_url(
     db: Session = Depends(get_db)
 ):
     """
-    Verifies the password for a protected URL. On success, it publishes
+    Verifies the password for a protected URL. On success, it queues
     a click event and returns the original URL.
     """
     db_url = db.query(URL).filter(URL.short_code == short_code).first()
@@ -151,9 +424,10 @@ def verify_password_and_get_url(
         raise HTTPException(status_code=status.HTTP_410_GONE, detail="URL has expired")
 
     # --- LÓGICA DE PUBLICAÇÃO ASSÍNCRONA ---
-    if publish_message(short_code):
-        log.info(f"Password verified for '{short_code}'. Publishing click event.")
-    else:
-        log.error(f"FAILED to publish click event for '{short_code}' after password verification.")
+    try:
+        queue_click_event(short_code)
+        hot_log.info("Password verified for '{}'. Click event queued.", short_code)
+    except OSError as e:
+        log.error(f"FAILED to queue click event for '{short_code}' after password verification. Error: {e}")
 
     return {"original_url": db_url.original_url}
\ No newline at end of file
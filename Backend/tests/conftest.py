@@ -6,6 +6,8 @@ from sqlalchemy.orm import sessionmaker
 
 from Backend.main import app
 from Backend.core.database import Base, get_db
+from Backend.core.outbox import event_log
+from Backend.core.resilience import breakers
 
 # --- Configuração do Banco de Dados de Teste ---
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:" # Usa um DB SQLite em memória
@@ -17,6 +19,27 @@ TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engin
 # Cria as tabelas no DB em memória antes de rodar os testes
 Base.metadata.create_all(bind=engine)
 
+# --- Outbox local isolado por teste ---
+@pytest.fixture(autouse=True)
+def isolated_event_log(tmp_path, monkeypatch):
+    """
+    Points the local outbox log at a temporary directory so tests never
+    write click events into the project tree.
+    """
+    monkeypatch.setattr(event_log, "directory", str(tmp_path / "outbox"))
+    return event_log
+
+# --- Circuit breakers fechados no início de cada teste ---
+@pytest.fixture(autouse=True)
+def reset_breakers():
+    """
+    Closes every circuit breaker, so failures provoked by one test (e.g. the
+    unreachable Redis) never leak into the next.
+    """
+    for breaker in breakers.values():
+        breaker.reset()
+    yield breakers
+
 # --- Fixture para Sobrescrever a Dependência do DB ---
 @pytest.fixture(scope="function")
 def db_session_override():
@@ -0,0 +1,230 @@
+# tests/test_bloom.py
+import time
+
+from fastapi.testclient import TestClient
+from redis import ConnectionError as RedisConnectionError, Redis
+from redis.backoff import NoBackoff
+from redis.retry import Retry
+
+from Backend.core.bloom import ShortCodeBloomFilter, bit_positions, get_bloom_filter, optimal_parameters
+from Backend.core.database import get_db
+from Backend.main import app
+import snapshot_exporter
+
+
+def test_optimal_parameters_match_target_error_rate():
+    """
+    Tests the classic sizing: ~9.6 bits and 7 hashes per item for a 1% error rate.
+    """
+    bits, hashes = optimal_parameters(1000, 0.01)
+    assert 9500 <= bits <= 9700
+    assert hashes == 7
+
+
+def test_bit_positions_give_no_false_negatives_and_bounded_false_positives():
+    """
+    Tests the hashing scheme on a local bitset: every inserted code is found
+    and the false-positive rate stays close to the target.
+    """
+    bits, hashes = optimal_parameters(5000, 0.01)
+    bitset = bytearray(bits)
+    inserted = [f"in-{i}" for i in range(5000)]
+    for code in inserted:
+        for position in bit_positions(code, bits, hashes):
+            bitset[position] = 1
+
+    def might_contain(code):
+        return all(bitset[position] for position in bit_positions(code, bits, hashes))
+
+    assert all(might_contain(code) for code in inserted)
+    false_positives = sum(might_contain(f"out-{i}") for i in range(20000))
+    assert false_positives / 20000 < 0.02
+
+
+def test_filter_fails_open_without_redis():
+    """
+    Tests that an unreachable Redis never produces a definite miss.
+    """
+    unreachable = Redis(host="127.0.0.1", port=1, socket_connect_timeout=0.1, retry=Retry(NoBackoff(), 0))
+    bloom = ShortCodeBloomFilter(unreachable, capacity=1000, error_rate=0.01)
+
+    assert bloom.might_contain("anything") is True
+    bloom.add("anything")  # Não deve levantar exceção
+    assert bloom.stats()["ready"] is False
+
+
+class FakeBitmapRedis:
+    """
+    In-memory Redis bitmap (SETBIT/GETBIT/EXISTS/GET/SET/INCR/DELETE) that can be
+    taken down entirely, or only refuse writes to the bitmap (`fail_bits`).
+    """
+
+    def __init__(self):
+        self.bits = {}
+        self.keys = {}
+        self.down = False
+        self.fail_bits = False
+
+    def _check(self):
+        if self.down:
+            raise RedisConnectionError("Redis is down")
+
+    def get(self, key):
+        self._check()
+        return self.keys.get(key)
+
+    def incr(self, key):
+        self.keys[key] = str(int(self.keys.get(key, 0)) + 1)
+
+    def register_script(self, script):
+        def mark_ready(keys, args):
+            self._check()
+            ready_key, epoch_key = keys
+            if (self.keys.get(epoch_key) or "") != args[0]:
+                return 0
+            self.keys[ready_key] = args[1]
+            return 1
+        return mark_ready
+
+    def pipeline(self, transaction=False):
+        return FakePipeline(self)
+
+    def set(self, key, value):
+        self._check()
+        self.keys[key] = value
+
+    def delete(self, key):
+        self._check()
+        self.keys.pop(key, None)
+
+    def exists(self, key):
+        self._check()
+        return int(key in self.keys)
+
+    def bitcount(self, key):
+        self._check()
+        return sum(1 for (name, _), bit in self.bits.items() if name == key and bit)
+
+
+class FakePipeline:
+    def __init__(self, redis: FakeBitmapRedis):
+        self.redis = redis
+        self.commands = []
+
+    def setbit(self, key, position, value):
+        self.writes_bits = True
+        self.commands.append(lambda: self.redis.bits.__setitem__((key, position), value))
+
+    def getbit(self, key, position):
+        self.commands.append(lambda: self.redis.bits.get((key, position), 0))
+
+    def exists(self, key):
+        self.commands.append(lambda: int(key in self.redis.keys))
+
+    def incr(self, key):
+        self.commands.append(lambda: self.redis.incr(key))
+
+    def delete(self, key):
+        self.commands.append(lambda: self.redis.keys.pop(key, None))
+
+    def execute(self):
+        self.redis._check()
+        if self.redis.fail_bits and getattr(self, "writes_bits", False):
+            raise RedisConnectionError("bitmap write failed")
+        return [command() for command in self.commands]
+
+
+class NoDatabase:
+    """Session stand-in that fails the test if the route queries it."""
+
+    def query(self, *args):
+        raise AssertionError("the database must not be queried")
+
+    def close(self):
+        pass
+
+
+def test_ready_filter_answers_404_without_database():
+    """
+    Tests that a definite miss of a ready filter answers 404 without querying the database.
+    """
+    bloom = ShortCodeBloomFilter(FakeBitmapRedis(), capacity=1000, error_rate=0.01)
+    bloom.rebuild(["exists"])
+    assert bloom.might_contain("exists") is True
+
+    app.dependency_overrides[get_db] = lambda: NoDatabase()
+    app.dependency_overrides[get_bloom_filter] = lambda: bloom
+    try:
+        with TestClient(app) as client:
+            assert client.get("/api/v1/r/missing", follow_redirects=False).status_code == 404
+    finally:
+        app.dependency_overrides.clear()
+    assert bloom.definite_misses == 1
+
+
+def wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_failed_add_is_invalidated_in_the_background(monkeypatch):
+    """
+    Tests that a code added while Redis was down is never reported missing, and that
+    the filter is invalidated for every replica once Redis is back, without any lookup.
+    """
+    redis = FakeBitmapRedis()
+    bloom = ShortCodeBloomFilter(redis, capacity=1000, error_rate=0.01, retry_interval=0.01)
+    other_replica = ShortCodeBloomFilter(redis, capacity=1000, error_rate=0.01)
+    bloom.rebuild(["old"])
+
+    redis.down = True
+    bloom.add("new")  # Nem o SETBIT nem a invalidação funcionam.
+    assert bloom.might_contain("new") is True
+    redis.down = False
+
+    # Nenhuma consulta neste processo: a thread de retry apaga "ready" sozinha.
+    assert wait_for(lambda: bloom.ready_key not in redis.keys)
+    assert wait_for(lambda: not bloom._dirty)
+    assert other_replica.might_contain("new") is True
+
+    # O exporter reconstrói o filtro a partir do banco assim que o encontra fora do estado "ready".
+    monkeypatch.setattr(snapshot_exporter, "stream_short_codes", lambda batch_size: iter(["old", "new"]))
+    snapshot_exporter.refresh_bloom_filter(bloom)
+    assert bloom.ready_key in redis.keys
+    assert bloom.might_contain("new") is True
+    assert bloom.might_contain("never-created") is False
+
+
+def test_rebuild_if_needed():
+    """
+    Tests that the filter is only rebuilt when it is not ready.
+    """
+    bloom = ShortCodeBloomFilter(FakeBitmapRedis(), capacity=1000, error_rate=0.01)
+    assert bloom.rebuild_if_needed(lambda: ["a", "b"]) == 2
+    assert bloom.rebuild_if_needed(lambda: ["a", "b", "c"]) is None
+    assert bloom.might_contain("a") is True
+
+
+def test_failed_add_during_rebuild_keeps_filter_not_ready():
+    """
+    Tests that a rebuild which started before a failed add does not mark the filter ready.
+    """
+    redis = FakeBitmapRedis()
+    bloom = ShortCodeBloomFilter(redis, capacity=1000, error_rate=0.01)
+
+    def codes():
+        yield "old"
+        # O código já está no banco, mas depois do ponto lido pelo rebuild, e o SETBIT falha.
+        redis.fail_bits = True
+        bloom.add("late")
+        redis.fail_bits = False
+
+    bloom.rebuild(codes(), batch_size=1)
+    assert bloom.ready_key not in redis.keys
+    assert bloom.might_contain("late") is True
+
+    bloom.rebuild(["old", "late"])
+    assert bloom.might_contain("late") is True
+    assert bloom.might_contain("never-created") is False
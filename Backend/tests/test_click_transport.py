@@ -0,0 +1,296 @@
+# tests/test_click_transport.py
+import signal
+
+import pytest
+
+import worker
+from Backend.core.alerter import ALERT_EXCHANGE_NAME
+from Backend.core.messaging import (
+    CLICK_QUEUE_NAME, AdaptiveBatchSize, AmqpClickTransport, ClickPartitioner, ClickTransport,
+    RedisStreamClickTransport, get_click_transport, stale_partition_names
+)
+from Backend.models.models import URL
+from outbox_relay import make_publish_batch
+
+
+class CollectingTransport(ClickTransport):
+    """Click transport that keeps published codes in memory."""
+    name = "memory"
+
+    def __init__(self):
+        self.published = []
+
+    def publish_clicks(self, short_codes):
+        self.published.extend(short_codes)
+
+    def consume(self, handle_batch):
+        handle_batch(self.published)
+
+
+class CollectingPublisher:
+    def __init__(self):
+        self.published = []
+
+    def publish_batch(self, events):
+        self.published.extend(events)
+
+
+def test_relay_routes_clicks_to_click_transport():
+    """
+    Tests that the relay sends click events through the click transport and alerts to RabbitMQ.
+    """
+    publisher, transport = CollectingPublisher(), CollectingTransport()
+    publish_batch = make_publish_batch(publisher, transport)
+
+    publish_batch([
+        ("", CLICK_QUEUE_NAME, "abc"),
+        (ALERT_EXCHANGE_NAME, "", "{}"),
+        ("", CLICK_QUEUE_NAME, "xyz"),
+    ])
+
+    assert transport.published == ["abc", "xyz"]
+    assert publisher.published == [(ALERT_EXCHANGE_NAME, "", "{}")]
+
+
+def test_click_transport_requires_publish_and_consume():
+    """
+    Tests that a transport missing one of the abstract methods cannot be built.
+    """
+    class PublishOnly(ClickTransport):
+        def publish_clicks(self, short_codes):
+            pass
+
+    with pytest.raises(TypeError):
+        PublishOnly()
+
+
+def test_unknown_click_transport_is_rejected():
+    """
+    Tests that a typo in CLICK_TRANSPORT fails loudly instead of silently dropping clicks.
+    """
+    with pytest.raises(ValueError):
+        get_click_transport("kafka")
+
+
+def test_apply_clicks_increments_once_per_code(db_session_override, monkeypatch):
+    """
+    Tests that a batch of click events is aggregated per short code.
+    """
+    db_session_override.add_all([
+        URL(short_code="hot", original_url="https://hot.example.com", current_clicks=1),
+        URL(short_code="cold", original_url="https://cold.example.com", current_clicks=0),
+    ])
+    db_session_override.flush()
+    monkeypatch.setattr(worker, "get_db_session", lambda: db_session_override)
+    monkeypatch.setattr(db_session_override, "close", lambda: None)
+
+    worker.apply_clicks(["hot", "hot", "cold", "hot", "missing"])
+
+    clicks = dict(db_session_override.query(URL.short_code, URL.current_clicks))
+    assert clicks == {"hot": 4, "cold": 1}
+
+
+def test_partitioner_gives_each_code_one_owner():
+    """
+    Tests that codes are spread over every partition and always land on the same one.
+    """
+    partitioner = ClickPartitioner(4)
+    codes = [f"code{i}" for i in range(2000)]
+    groups = partitioner.split(codes + codes)
+
+    assert sorted(groups) == [0, 1, 2, 3]
+    for partition, grouped in groups.items():
+        assert all(partitioner.partition_for(code) == partition for code in grouped)
+        assert len(grouped) > 2 * 2000 / 4 * 0.5  # Nenhuma partição fica quase vazia
+    assert ClickPartitioner(1).split(codes) == {0: codes}
+
+
+def test_amqp_transport_publishes_to_partition_queues():
+    """
+    Tests that published clicks go to the queue of their partition.
+    """
+    transport = AmqpClickTransport(url="amqp://unused", partitions=3)
+    transport.publisher = CollectingPublisher()
+    transport.publish_clicks(["a", "b", "c", "d", "a"])
+
+    for exchange, queue, code in transport.publisher.published:
+        assert exchange == ""
+        assert queue == f"{CLICK_QUEUE_NAME}.{transport.partitioner.partition_for(code)}"
+    assert sorted(code for _, _, code in transport.publisher.published) == ["a", "a", "b", "c", "d"]
+
+
+def test_adaptive_batch_size_is_aimd():
+    """
+    Tests that full, fast batches grow the size additively and slow ones halve it.
+    """
+    batching = AdaptiveBatchSize(initial=100, minimum=10, maximum=160, step=50, target_latency=0.1)
+    assert batching.observe(100, 0.01) == 150
+    assert batching.observe(20, 0.01) == 150  # Lote incompleto: o tamanho não era o gargalo
+    assert batching.observe(150, 0.01) == 160
+    assert batching.observe(160, 0.5) == 80
+    for _ in range(5):
+        batching.observe(10, 1.0)
+    assert batching.size == 10
+
+
+class FakeStreamClient:
+    """Just enough of a Redis client for one consumer group read, with optional pending entries."""
+
+    def __init__(self, entries, pending=()):
+        self.entries = entries
+        self.pending = list(pending)
+        self.acked = []
+        self.claims = []
+
+    def xgroup_create(self, *args, **kwargs):
+        pass
+
+    def xautoclaim(self, name, groupname, consumername, min_idle_time, start_id="0-0", count=None):
+        # Pagina como o Redis: devolve o cursor da próxima página, ou "0-0" no fim.
+        self.claims.append((consumername, min_idle_time, start_id))
+        pending = [entry for entry in self.pending if entry[0] >= start_id]
+        page, rest = pending[:count], pending[count:]
+        return [rest[0][0] if rest else "0-0", page]
+
+    def xreadgroup(self, group, consumer, streams, count, block):
+        batch, self.entries = self.entries[:count], self.entries[count:]
+        return [(next(iter(streams)), batch)] if batch else []
+
+    def xack(self, key, group, *ids):
+        self.acked.extend(ids)
+
+
+def test_stop_flushes_batch_in_flight():
+    """
+    Tests that stop() lets the consumer finish and acknowledge the current batch, then return.
+    """
+    client = FakeStreamClient([(f"{i}-0", {"c": f"code{i}"}) for i in range(10)])
+    transport = RedisStreamClickTransport(client=client, batch_size=4, partition=1, partitions=2)
+    handled = []
+
+    def handle_batch(short_codes):
+        handled.extend(short_codes)
+        transport.stop()  # Ex.: SIGTERM chegou enquanto o lote era gravado
+
+    transport.consume(handle_batch)
+
+    assert handled == ["code0", "code1", "code2", "code3"]
+    assert client.acked == ["0-0", "1-0", "2-0", "3-0"]
+    assert transport.stream.endswith(".1")
+
+
+def test_reclaim_takes_over_pending_entries():
+    """
+    Tests that reclaim() pages through XAUTOCLAIM, handles and acknowledges every
+    pending entry, and skips the ones already trimmed by MAXLEN.
+    """
+    pending = [("1-0", {"c": "a"}), ("2-0", {}), ("3-0", {"c": "b"}), ("4-0", {"c": "c"})]
+    client = FakeStreamClient([], pending=pending)
+    transport = RedisStreamClickTransport(client=client, batch_size=2, reclaim_idle_ms=30000)
+    handled = []
+
+    assert transport.reclaim(handled.append) == 4
+
+    assert handled == [["a"], ["b", "c"]]
+    assert client.acked == ["1-0", "2-0", "3-0", "4-0"]
+    assert [start for _, _, start in client.claims] == ["0-0", "3-0"]
+    assert all(consumer == transport.consumer and idle == 30000 for consumer, idle, _ in client.claims)
+
+
+def test_stale_partition_names():
+    """
+    Tests the names left behind when CLICK_PARTITIONS grows from 1 or shrinks.
+    """
+    assert stale_partition_names("clicks", 1, limit=3) == ["clicks.0", "clicks.1", "clicks.2"]
+    assert stale_partition_names("clicks", 2, limit=4) == ["clicks", "clicks.2", "clicks.3"]
+
+
+class FakeStreamsClient(FakeStreamClient):
+    """Fake Redis client holding several streams, for draining old partitions."""
+
+    def __init__(self, streams):
+        super().__init__([])
+        self.streams = streams
+        self.acked_by_stream = {}
+
+    def exists(self, key):
+        return int(key in self.streams)
+
+    def xgroup_create(self, name, *args, **kwargs):
+        assert name in self.streams
+
+    def xreadgroup(self, group, consumer, streams, count, block):
+        (name,) = streams
+        batch, self.streams[name] = self.streams[name][:count], self.streams[name][count:]
+        return [(name, batch)] if batch else []
+
+    def xack(self, key, group, *ids):
+        self.acked_by_stream.setdefault(key, []).extend(ids)
+
+
+def test_redis_transport_drains_streams_of_old_partition_counts():
+    """
+    Tests that a 2-partition consumer empties the unsuffixed stream and the ones above its range.
+    """
+    client = FakeStreamsClient({
+        "clicks": [("1-0", {"c": "legacy"})],
+        "clicks.1": [("1-0", {"c": "current"})],
+        "clicks.3": [(f"{i}-0", {"c": f"old{i}"}) for i in range(5)],
+    })
+    transport = RedisStreamClickTransport(key="clicks", client=client, batch_size=2, partition=0, partitions=2)
+    handled = []
+
+    assert transport.drain_stale_partitions(handled.extend) == 6
+
+    assert handled == ["legacy", "old0", "old1", "old2", "old3", "old4"]
+    assert client.streams["clicks.1"] == [("1-0", {"c": "current"})]
+    assert client.acked_by_stream == {"clicks": ["1-0"], "clicks.3": [f"{i}-0" for i in range(5)]}
+
+
+class StaleTransport(ClickTransport):
+    """Transport with clicks waiting in an old partition; consume() stops right away."""
+
+    def publish_clicks(self, short_codes):
+        pass
+
+    def drain_stale_partitions(self, handle_batch):
+        handle_batch(["stale"])
+        return 1
+
+    def consume(self, handle_batch):
+        self.stop()
+
+
+def test_first_partition_drains_stale_partitions(monkeypatch):
+    """
+    Tests that only the consumer of partition 0 drains the partitions of an earlier layout.
+    """
+    applied = []
+    monkeypatch.setattr(worker, "apply_clicks", applied.extend)
+    monkeypatch.setattr(worker, "get_click_transport", lambda partition: StaleTransport(partition=partition))
+    previous = {signum: signal.getsignal(signum) for signum in (signal.SIGTERM, signal.SIGINT)}
+    try:
+        worker.connect_and_consume(1)
+        assert applied == []
+        worker.connect_and_consume(0)
+    finally:
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+    assert applied == ["stale"]
+
+
+def test_partition_process_restores_default_signals(monkeypatch):
+    """
+    Tests that a forked consumer drops the supervisor's SIGTERM/SIGINT handlers before doing any work.
+    """
+    seen = []
+    monkeypatch.setattr(worker, "dispose_engines", lambda close: seen.append(signal.getsignal(signal.SIGTERM)))
+    monkeypatch.setattr(worker, "connect_and_consume", lambda partition: seen.append(signal.getsignal(signal.SIGINT)))
+    monkeypatch.setattr(worker, "flush_logs", lambda: None)
+    previous = {signum: signal.signal(signum, lambda *_: None) for signum in (signal.SIGTERM, signal.SIGINT)}
+    try:
+        worker._run_partition(3)
+    finally:
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+    assert seen == [signal.SIG_DFL, signal.SIG_DFL]
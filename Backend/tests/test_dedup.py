@@ -0,0 +1,79 @@
+# tests/test_dedup.py
+from fastapi.testclient import TestClient
+
+from Backend.core.dedup import destination_hash, normalize_url
+from Backend.models.models import URL
+
+
+def test_normalize_url():
+    """
+    Tests that equivalent spellings of a destination share one fingerprint and different ones do not.
+    """
+    assert normalize_url("HTTPS://Example.COM:443#top") == "https://example.com/#top"
+    assert normalize_url("http://example.com:8080/a?b=1") == "http://example.com:8080/a?b=1"
+    assert destination_hash("https://example.com") == destination_hash("https://EXAMPLE.com/")
+    assert destination_hash("https://example.com/#/settings") != destination_hash("https://example.com/#/billing")
+    assert destination_hash("https://example.com/?a=1&b=2") != destination_hash("https://example.com/?b=2&a=1")
+    assert len(destination_hash("https://example.com")) == 64
+
+
+def test_deduplicate_returns_existing_code(client: TestClient):
+    """
+    Tests that an opt-in dedup request reuses the public link of the same destination.
+    """
+    first = client.post("/api/v1/shorten", json={"url": "https://dedup.example.com/page"})
+    assert first.status_code == 201
+
+    again = client.post("/api/v1/shorten", json={"url": "HTTPS://dedup.example.com:443/page", "deduplicate": True})
+    assert again.status_code == 200
+    assert again.json()["short_url"] == first.json()["short_url"]
+
+    # Sem opt-in, o comportamento antigo continua: sempre um novo código.
+    fresh = client.post("/api/v1/shorten", json={"url": "https://dedup.example.com/page"})
+    assert fresh.status_code == 201
+    assert fresh.json()["short_url"] != first.json()["short_url"]
+
+
+def test_deduplicate_skips_protected_links(client: TestClient):
+    """
+    Tests that protected, limited or differently cached links are never handed out by dedup.
+    """
+    protected = client.post("/api/v1/shorten", json={"url": "https://private.example.com", "password": "secret"})
+    limited = client.post("/api/v1/shorten", json={"url": "https://private.example.com", "max_clicks": 5})
+    permanent = client.post("/api/v1/shorten", json={"url": "https://private.example.com", "redirect_policy": "permanent"})
+
+    public = client.post("/api/v1/shorten", json={"url": "https://private.example.com", "deduplicate": True})
+    assert public.status_code == 201
+    taken = {r.json()["short_url"] for r in (protected, limited, permanent)}
+    assert public.json()["short_url"] not in taken
+
+
+def test_deduplicate_keeps_fragments_apart(client: TestClient):
+    """
+    Tests that destinations differing only in the fragment never share a code.
+    """
+    settings_link = client.post("/api/v1/shorten", json={"url": "https://app.example/#/settings"})
+    billing_link = client.post("/api/v1/shorten", json={"url": "https://app.example/#/billing", "deduplicate": True})
+    assert billing_link.status_code == 201
+    assert billing_link.json()["short_url"] != settings_link.json()["short_url"]
+
+    code = billing_link.json()["short_url"].rsplit("/", 1)[1]
+    redirect = client.get(f"/api/v1/r/{code}", follow_redirects=False)
+    assert redirect.headers["location"] == "https://app.example/#/billing"
+
+
+def test_deduplicate_ignores_rows_with_a_stale_hash(client: TestClient, db_session_override):
+    """
+    Tests that a row whose stored hash matches but whose destination differs is not reused.
+    """
+    stale = client.post("/api/v1/shorten", json={"url": "https://stale.example/#/a"})
+    code = stale.json()["short_url"].rsplit("/", 1)[1]
+    # Hash calculado antes de o fragmento fazer parte da forma normalizada.
+    db_session_override.query(URL).filter(URL.short_code == code).update(
+        {URL.original_url_hash: destination_hash("https://stale.example/")}
+    )
+    db_session_override.commit()
+
+    plain = client.post("/api/v1/shorten", json={"url": "https://stale.example/", "deduplicate": True})
+    assert plain.status_code == 201
+    assert plain.json()["short_url"] != stale.json()["short_url"]
@@ -0,0 +1,187 @@
+# tests/test_idempotency.py
+import pytest
+from fastapi.testclient import TestClient
+from redis import Redis
+from redis.backoff import NoBackoff
+from redis.retry import Retry
+
+from Backend.core import security
+from Backend.core.idempotency import (
+    IdempotencyClaim, IdempotencyInProgress, IdempotencyKeyReused, IdempotencyStore, StoredResponse,
+    get_idempotency_store, request_fingerprint
+)
+from Backend.main import app
+
+
+class FakeRedis:
+    """Just enough of redis.Redis for the idempotency store (TTLs are ignored)."""
+
+    def __init__(self):
+        self.data = {}
+
+    def set(self, key, value, nx=False, px=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def register_script(self, script):
+        def replace_claim(keys, args):
+            key, (expected, value) = keys[0], args[:2]
+            if self.data.get(key) != expected:
+                return 0
+            if value == "":
+                del self.data[key]
+            else:
+                self.data[key] = value
+            return 1
+        return replace_claim
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_store(redis=None, **kwargs) -> IdempotencyStore:
+    clock = FakeClock()
+
+    def sleep(seconds):
+        clock.now += seconds
+
+    kwargs.setdefault("secret", "test-secret")
+    return IdempotencyStore(redis or FakeRedis(), wait_timeout=1.0, poll_interval=0.25, clock=clock, sleep=sleep, **kwargs)
+
+
+@pytest.fixture
+def idempotency_store():
+    store = make_store()
+    app.dependency_overrides[get_idempotency_store] = lambda: store
+    yield store
+    app.dependency_overrides.pop(get_idempotency_store, None)
+
+
+def test_store_claims_replays_and_rejects_reuse():
+    """
+    Tests claim -> complete -> replay, key reuse with another body, and release.
+    """
+    store = make_store()
+    claim = store.begin("shorten", "key-1", "body-a")
+    assert isinstance(claim, IdempotencyClaim)
+
+    # Enquanto a primeira requisição não termina, uma repetição espera e desiste após o timeout.
+    with pytest.raises(IdempotencyInProgress):
+        store.begin("shorten", "key-1", "body-a")
+
+    store.complete(claim, 201, {"short_url": "x"})
+    assert store.begin("shorten", "key-1", "body-a") == StoredResponse(201, {"short_url": "x"})
+    with pytest.raises(IdempotencyKeyReused):
+        store.begin("shorten", "key-1", "body-b")
+
+    other = store.begin("shorten", "key-2", "body-a")
+    store.release(other)
+    assert isinstance(store.begin("shorten", "key-2", "body-a"), IdempotencyClaim)
+
+
+def test_fingerprint_does_not_expose_passwords():
+    """
+    Tests that fingerprints are keyed, and that without a secret a body with a password gets none.
+    """
+    payload = {"url": "https://example.com", "password": "secret"}
+    keyed = request_fingerprint(payload, "server-secret", sensitive=True)
+    assert keyed != request_fingerprint(payload, "other-secret", sensitive=True)
+    assert keyed != request_fingerprint(payload, None)
+    assert request_fingerprint(payload, None, sensitive=True) is None
+    assert request_fingerprint({"url": "https://example.com"}, None) is not None
+
+
+def test_password_requests_skip_idempotency_without_secret(client: TestClient):
+    """
+    Tests that without IDEMPOTENCY_SECRET a password never reaches Redis, even hashed.
+    """
+    redis = FakeRedis()
+    app.dependency_overrides[get_idempotency_store] = lambda: make_store(redis, secret=None)
+    payload = {"url": "https://nosecret.example.com", "password": "secret"}
+    headers = {"Idempotency-Key": "no-secret"}
+
+    first = client.post("/api/v1/shorten", json=payload, headers=headers)
+    second = client.post("/api/v1/shorten", json=payload, headers=headers)
+    assert first.status_code == second.status_code == 201
+    assert first.json() != second.json()
+    assert redis.data == {}
+
+
+def test_concurrent_duplicate_waits_for_original():
+    """
+    Tests that a duplicate arriving while the original is in flight gets its response.
+    """
+    redis = FakeRedis()
+    original = make_store(redis)
+    claim = original.begin("shorten", "key", "body")
+
+    duplicate = make_store(redis)
+    polls = []
+
+    def sleep(seconds):
+        polls.append(seconds)
+        original.complete(claim, 201, {"short_url": "done"})
+
+    duplicate.sleep = sleep
+    assert duplicate.begin("shorten", "key", "body") == StoredResponse(201, {"short_url": "done"})
+    assert len(polls) == 1
+
+
+def test_retry_with_same_key_is_replayed(client: TestClient, idempotency_store, monkeypatch):
+    """
+    Tests that a retried shorten request returns the original link without hashing or inserting again.
+    """
+    hashes = []
+    monkeypatch.setattr(security, "hash_password", lambda password: hashes.append(password) or "hashed")
+    payload = {"url": "https://retry.example.com", "password": "secret"}
+    headers = {"Idempotency-Key": "retry-1"}
+
+    first = client.post("/api/v1/shorten", json=payload, headers=headers)
+    retry = client.post("/api/v1/shorten", json=payload, headers=headers)
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == first.json()
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert hashes == ["secret"]
+
+    changed = client.post("/api/v1/shorten", json={**payload, "url": "https://other.example.com"}, headers=headers)
+    assert changed.status_code == 422
+
+    # Sem o header, cada chamada continua criando um link novo.
+    assert client.post("/api/v1/shorten", json=payload).json() != first.json()
+
+
+def test_client_errors_are_replayed(client: TestClient, idempotency_store):
+    """
+    Tests that a 4xx answer is stored too, so the retry does not run the request again.
+    """
+    client.post("/api/v1/shorten", json={"url": "https://taken.example.com", "custom_alias": "taken"})
+    payload = {"url": "https://late.example.com", "custom_alias": "taken"}
+    headers = {"Idempotency-Key": "alias-1"}
+
+    first = client.post("/api/v1/shorten", json=payload, headers=headers)
+    retry = client.post("/api/v1/shorten", json=payload, headers=headers)
+    assert first.status_code == retry.status_code == 409
+    assert retry.json() == first.json() == {"detail": "Custom alias already in use."}
+    assert retry.headers["idempotent-replayed"] == "true"
+
+
+def test_idempotency_fails_open_without_redis(client: TestClient):
+    """
+    Tests that an unreachable Redis does not block link creation.
+    """
+    unreachable = Redis(host="127.0.0.1", port=1, socket_connect_timeout=0.1, retry=Retry(NoBackoff(), 0))
+    app.dependency_overrides[get_idempotency_store] = lambda: IdempotencyStore(unreachable)
+
+    response = client.post("/api/v1/shorten", json={"url": "https://open.example.com"},
+                           headers={"Idempotency-Key": "no-redis"})
+    assert response.status_code == 201
@@ -0,0 +1,86 @@
+# tests/test_logging.py
+import os
+import signal
+import time
+
+import pytest
+
+from Backend.core import logger as logging_setup
+from Backend.core.logger import SampledLogger, log, set_module_level
+
+
+@pytest.fixture
+def captured():
+    """Collects the messages logged while the test runs."""
+    messages = []
+    handler = log.add(lambda message: messages.append(message.record["message"]), level="DEBUG",
+                      filter=logging_setup._module_filter)
+    yield messages
+    log.remove(handler)
+    logging_setup._module_levels.pop(__name__, None)
+    logging_setup._resolved_levels.clear()
+
+
+def test_module_level_can_be_changed_at_runtime(captured):
+    """
+    Tests that raising a module's level silences it without touching other modules.
+    """
+    log.info("before {}", 1)
+    set_module_level(__name__, "WARNING")
+    log.info("hidden {}", 2)
+    log.warning("kept {}", 3)
+
+    assert captured == ["before 1", "kept 3"]
+
+
+def test_sampled_logger_rate_limits_each_call_site(captured):
+    """
+    Tests that a call site is capped at its rate limit while another site still logs.
+    """
+    sampled = SampledLogger(max_per_second=3)
+    for i in range(50):
+        sampled.info("busy {}", i)
+    sampled.info("other site")
+
+    assert captured == ["busy 0", "busy 1", "busy 2", "other site"]
+
+
+def test_unlimited_sampled_logger_is_plain_loguru(captured):
+    """
+    Tests that without sampling or rate limit the hot logger is loguru itself, and module levels still apply.
+    """
+    unlimited = SampledLogger(sample_rate=1.0, max_per_second=0)
+    assert unlimited.info == log.info
+    unlimited.info("kept {}", 1)
+    set_module_level(__name__, "WARNING")
+    unlimited.info("hidden {}", 2)
+
+    assert captured == ["kept 1"]
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGHUP"), reason="SIGHUP is POSIX only")
+def test_sighup_reload_runs_outside_the_signal_handler(captured, tmp_path, monkeypatch):
+    """
+    Tests that SIGHUP only wakes the reload thread, which applies LOG_LEVELS_FILE.
+    """
+    levels_file = tmp_path / "levels.conf"
+    levels_file.write_text("")
+    monkeypatch.setattr(logging_setup, "LOG_LEVELS_FILE", str(levels_file))
+    previous = signal.getsignal(signal.SIGHUP)
+    try:
+        logging_setup.install_reload_handler()
+        assert signal.getsignal(signal.SIGHUP) is logging_setup._request_reload
+
+        levels_file.write_text(f"{__name__}=ERROR")
+        os.kill(os.getpid(), signal.SIGHUP)
+        deadline = time.monotonic() + 5
+        while logging_setup._module_levels.get(__name__) is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        signal.signal(signal.SIGHUP, previous)
+
+    assert logging_setup._reload_thread.is_alive()
+    log.warning("hidden")
+    log.error("kept")
+    assert captured[-1] == "kept"
+    assert "hidden" not in captured
@@ -0,0 +1,123 @@
+# tests/test_redirect_policy.py
+import glob
+import os
+
+from fastapi.testclient import TestClient
+
+from Backend.core.outbox import EventLog
+from Backend.core.snapshot import RedirectSnapshot, export_snapshot, get_snapshot
+from Backend.main import app
+
+
+def queued_clicks(event_log: EventLog) -> list:
+    """Reads every event body written to the (isolated) local outbox, including open segments."""
+    paths = sorted(glob.glob(os.path.join(event_log.directory, "events-*.log")))
+    return [body for path in paths for _, _, body in event_log.read_segment(path)]
+
+
+def test_permanent_link_is_cacheable(client: TestClient, isolated_event_log):
+    """
+    Tests that permanent links answer 301 with a public max-age, and that a beacon-counted
+    link leaves the count to the beacon.
+    """
+    payload = {
+        "url": "https://cached.example.com", "custom_alias": "cached",
+        "redirect_policy": "permanent", "cache_max_age": 600, "click_counting": "beacon",
+    }
+    assert client.post("/api/v1/shorten", json=payload).status_code == 201
+
+    response = client.get("/api/v1/r/cached", follow_redirects=False)
+    assert response.status_code == 301
+    assert response.headers["location"] == "https://cached.example.com"
+    assert response.headers["cache-control"] == "public, max-age=600"
+    assert queued_clicks(isolated_event_log) == []
+
+    assert client.post("/api/v1/beacon/cached").status_code == 204
+    assert queued_clicks(isolated_event_log) == ["cached"]
+
+
+def test_permanent_link_counts_origin_hits_by_default(client: TestClient, isolated_event_log):
+    """
+    Tests that a permanent link shared without a beacon still counts the hits that reach the origin.
+    """
+    payload = {"url": "https://shared.example.com", "custom_alias": "shared", "redirect_policy": "permanent"}
+    assert client.post("/api/v1/shorten", json=payload).status_code == 201
+
+    response = client.get("/api/v1/r/shared", follow_redirects=False)
+    assert response.status_code == 301
+    assert queued_clicks(isolated_event_log) == ["shared"]
+    # Sem opt-in, um beacon contaria o mesmo clique duas vezes.
+    assert client.post("/api/v1/beacon/shared").status_code == 404
+    assert queued_clicks(isolated_event_log) == ["shared"]
+
+
+def test_beacon_counting_requires_permanent_policy(client: TestClient):
+    """
+    Tests that temporary links cannot opt out of counting their redirects.
+    """
+    payload = {"url": "https://example.com", "click_counting": "beacon"}
+    assert client.post("/api/v1/shorten", json=payload).status_code == 400
+
+
+def test_permanent_link_with_zero_max_age(client: TestClient, db_session_override, tmp_path):
+    """
+    Tests that cache_max_age=0 is served as max-age=0, from the database and from the snapshot.
+    """
+    payload = {
+        "url": "https://zero.example.com", "custom_alias": "zero",
+        "redirect_policy": "permanent", "cache_max_age": 0,
+    }
+    assert client.post("/api/v1/shorten", json=payload).status_code == 201
+    response = client.get("/api/v1/r/zero", follow_redirects=False)
+    assert response.headers["cache-control"] == "public, max-age=0"
+
+    path = str(tmp_path / "redirects.bin")
+    export_snapshot(lambda: db_session_override, path)
+    snapshot = RedirectSnapshot(path, reload_interval=0)
+    assert snapshot.lookup("zero").cache_max_age == 0
+    app.dependency_overrides[get_snapshot] = lambda: snapshot
+    try:
+        response = client.get("/api/v1/r/zero", follow_redirects=False)
+    finally:
+        app.dependency_overrides.pop(get_snapshot, None)
+    assert response.headers["cache-control"] == "public, max-age=0"
+
+
+def test_temporary_link_is_not_stored(client: TestClient, isolated_event_log):
+    """
+    Tests that the default policy answers 307 with no-store and queues the click.
+    """
+    payload = {"url": "https://fresh.example.com", "custom_alias": "fresh"}
+    assert client.post("/api/v1/shorten", json=payload).status_code == 201
+
+    response = client.get("/api/v1/r/fresh", follow_redirects=False)
+    assert response.status_code == 307
+    assert response.headers["cache-control"] == "no-store"
+    assert queued_clicks(isolated_event_log) == ["fresh"]
+
+
+def test_permanent_policy_rejected_for_protected_links(client: TestClient):
+    """
+    Tests that password-protected or click-limited links cannot be made permanent.
+    """
+    for extra in ({"password": "secret"}, {"max_clicks": 3}):
+        payload = {"url": "https://example.com", "redirect_policy": "permanent", **extra}
+        assert client.post("/api/v1/shorten", json=payload).status_code == 400
+
+
+def test_beacon_only_counts_permanent_links(client: TestClient, isolated_event_log):
+    """
+    Tests that beacons for links counted at the origin (temporary, click-limited, protected or
+    permanent without opt-in) are rejected without queuing a click.
+    """
+    for payload in (
+        {"url": "https://limited.example.com", "custom_alias": "limited", "max_clicks": 1},
+        {"url": "https://locked.example.com", "custom_alias": "locked", "password": "secret"},
+        {"url": "https://plain.example.com", "custom_alias": "plain"},
+        {"url": "https://origin.example.com", "custom_alias": "origin", "redirect_policy": "permanent"},
+    ):
+        assert client.post("/api/v1/shorten", json=payload).status_code == 201
+
+    for code in ("limited", "locked", "plain", "origin", "missing"):
+        assert client.post(f"/api/v1/beacon/{code}").status_code == 404
+    assert queued_clicks(isolated_event_log) == []
@@ -0,0 +1,96 @@
+# tests/test_resilience.py
+import pytest
+from fastapi.testclient import TestClient
+
+from Backend.core.database import get_db
+from Backend.core.resilience import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, postgres_breaker
+)
+from Backend.core.snapshot import RedirectSnapshot, get_snapshot, write_snapshot
+from Backend.main import app
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def fail(breaker: CircuitBreaker):
+    with pytest.raises(ConnectionError):
+        with breaker.guard():
+            raise ConnectionError("down")
+
+
+def test_breaker_opens_and_probes_after_timeout():
+    """
+    Tests the closed -> open -> half-open -> closed cycle and that a failed probe reopens it.
+    """
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_exceptions=(ConnectionError,), failure_threshold=3,
+                             reset_timeout=10, clock=clock)
+    for _ in range(3):
+        fail(breaker)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        with breaker.guard():
+            pass
+    assert breaker.snapshot()["rejected_total"] == 1
+
+    clock.now = 10
+    assert breaker.snapshot()["state"] == HALF_OPEN
+    fail(breaker)  # A sonda falha: abre de novo por mais um período
+    assert breaker.state == OPEN
+
+    clock.now = 20
+    with breaker.guard():
+        pass
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["opened_total"] == 2
+
+
+def test_breaker_ignores_unrelated_exceptions():
+    """
+    Tests that errors outside failure_exceptions (e.g. business errors) do not trip the breaker.
+    """
+    breaker = CircuitBreaker("test", failure_exceptions=(ConnectionError,), failure_threshold=1)
+    with pytest.raises(ValueError):
+        with breaker.guard():
+            raise ValueError("conflict")
+    assert breaker.state == CLOSED
+
+
+def test_open_postgres_breaker_serves_snapshot_without_database(tmp_path):
+    """
+    Tests that redirects skip the database entirely while the Postgres breaker is open.
+    """
+    path = str(tmp_path / "redirects.bin")
+    write_snapshot(path, [("limited", "https://limited.example.com", 2, 0)])
+    snapshot = RedirectSnapshot(path, reload_interval=0)
+
+    class UntouchableSession:
+        def query(self, *args):
+            raise AssertionError("the database must not be queried while the breaker is open")
+
+    for _ in range(postgres_breaker.failure_threshold):
+        postgres_breaker.record_failure()
+
+    app.dependency_overrides[get_db] = lambda: UntouchableSession()
+    app.dependency_overrides[get_snapshot] = lambda: snapshot
+    try:
+        with TestClient(app) as client:
+            response = client.get("/api/v1/r/limited", follow_redirects=False)
+            assert response.status_code == 307
+            assert client.get("/api/v1/r/unknown", follow_redirects=False).status_code == 503
+
+            health = client.get("/health").json()
+            assert health["status"] == "degraded"
+            assert health["dependencies"]["postgres"] == OPEN
+
+            metrics = client.get("/metrics").text
+            assert 'nytheris_circuit_breaker_state{dependency="postgres"} 2' in metrics
+            assert 'nytheris_circuit_breaker_rejected_total{dependency="postgres"} 2' in metrics
+    finally:
+        app.dependency_overrides.clear()
@@ -0,0 +1,200 @@
+# tests/test_sharding.py
+from collections import Counter
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from Backend.core.database import Base, get_db
+from Backend.core.dedup import destination_hash
+from Backend.core.sharding import HashRing, ShardRouter
+from Backend.main import app
+from Backend.models.models import URL
+from rebalance_shards import fill_missing_hashes, rebalance
+import worker
+
+
+def make_engines(count: int) -> dict:
+    """Creates `count` independent in-memory SQLite shards."""
+    engines = {}
+    for i in range(count):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        engines[f"shard{i}"] = engine
+    return engines
+
+
+def codes_on(engine) -> set:
+    with Session(bind=engine) as session:
+        return {code for (code,) in session.query(URL.short_code)}
+
+
+def test_hash_ring_is_stable_and_balanced():
+    """
+    Tests that the ring always maps a key to the same shard and spreads keys
+    over every shard.
+    """
+    ring = HashRing(["shard0", "shard1", "shard2"])
+    keys = [f"code{i}" for i in range(3000)]
+
+    assert [ring.get(key) for key in keys] == [ring.get(key) for key in keys]
+    counts = Counter(ring.get(key) for key in keys)
+    assert set(counts) == {"shard0", "shard1", "shard2"}
+    assert min(counts.values()) > 600
+
+
+def test_adding_a_shard_moves_only_a_fraction_of_keys():
+    """
+    Tests that growing the ring from 3 to 4 shards only moves keys to the new shard.
+    """
+    old_ring = HashRing(["shard0", "shard1", "shard2"])
+    new_ring = HashRing(["shard0", "shard1", "shard2", "shard3"])
+    keys = [f"code{i}" for i in range(3000)]
+
+    moved = [key for key in keys if old_ring.get(key) != new_ring.get(key)]
+    assert all(new_ring.get(key) == "shard3" for key in moved)
+    assert len(moved) < len(keys) / 2
+
+
+def test_api_writes_each_url_to_its_owning_shard():
+    """
+    Tests that URLs created through the API land on the shard chosen by the
+    router and that alias conflicts are still detected.
+    """
+    engines = make_engines(3)
+    router = ShardRouter(engines)
+    ShardedSessionLocal = sessionmaker(class_=ShardedSession, autoflush=False, **router.session_options())
+
+    def override_get_db():
+        db = ShardedSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        with TestClient(app) as client:
+            aliases = [f"alias-{i}" for i in range(20)]
+            for alias in aliases:
+                response = client.post("/api/v1/shorten", json={"url": "https://example.com", "custom_alias": alias})
+                assert response.status_code == 201
+
+            conflict = client.post("/api/v1/shorten", json={"url": "https://example.com", "custom_alias": "alias-7"})
+            assert conflict.status_code == 409
+    finally:
+        app.dependency_overrides.clear()
+
+    for alias in aliases:
+        owner = router.shard_for(alias)
+        assert alias in codes_on(engines[owner])
+        assert all(alias not in codes_on(engine) for shard_id, engine in engines.items() if shard_id != owner)
+
+
+def test_rebalance_moves_rows_to_new_owner():
+    """
+    Tests that the rebalancing tool moves every misplaced row after a shard is added.
+    """
+    engines = make_engines(3)
+    old_router = ShardRouter({shard_id: engines[shard_id] for shard_id in ("shard0", "shard1")})
+    old_session = sessionmaker(class_=ShardedSession, **old_router.session_options())()
+    codes = [f"code{i}" for i in range(200)]
+    for i, code in enumerate(codes):
+        old_session.add(URL(
+            short_code=code, original_url=f"https://example.com/{code}", current_clicks=i,
+            original_url_hash=destination_hash(f"https://example.com/{code}"),
+            redirect_policy="permanent", cache_max_age=600 + i,
+        ))
+    old_session.commit()
+    old_session.close()
+
+    new_router = ShardRouter(engines)
+    stats = rebalance(new_router, batch_size=17)
+
+    assert stats["scanned"] >= len(codes)
+    assert stats["moved"] > 0
+    for code in codes:
+        owner = new_router.shard_for(code)
+        assert code in codes_on(engines[owner])
+    # Todas as colunas sobrevivem à mudança de shard, inclusive as adicionadas depois do rebalanceador.
+    with sessionmaker(class_=ShardedSession, **new_router.session_options())() as session:
+        rows = {row.short_code: row for row in session.query(URL)}
+    for i, code in enumerate(codes):
+        assert (rows[code].current_clicks, rows[code].redirect_policy, rows[code].cache_max_age) == (i, "permanent", 600 + i)
+        assert rows[code].original_url_hash == destination_hash(f"https://example.com/{code}")
+    assert sum(len(codes_on(engine)) for engine in engines.values()) == len(codes)
+
+    # Uma segunda execução não encontra mais nada para mover.
+    assert rebalance(new_router)["moved"] == 0
+
+    # Linhas movidas por versões antigas, sem o hash, são corrigidas.
+    with Session(bind=engines["shard2"]) as session:
+        session.query(URL).update({URL.original_url_hash: None})
+        session.commit()
+    assert fill_missing_hashes(new_router) == len(codes_on(engines["shard2"])) > 0
+    with Session(bind=engines["shard2"]) as session:
+        assert session.query(URL).filter(URL.original_url_hash.is_(None)).count() == 0
+
+
+def test_rebalance_locks_only_rows_it_moves():
+    """
+    Tests that a dry run takes no row locks and a real run only locks the misplaced rows.
+    """
+    engines = make_engines(2)
+    with Session(bind=engines["shard0"]) as session:
+        session.add_all([URL(short_code=f"code{i}", original_url="https://example.com") for i in range(40)])
+        session.commit()
+    router = ShardRouter(engines)
+    with Session(bind=engines["shard0"]) as session:
+        misplaced = {row.id for row in session.query(URL.id, URL.short_code) if router.shard_for(row.short_code) != "shard0"}
+    assert 0 < len(misplaced) < 40
+
+    locked = []
+
+    def record_locks(orm_execute_state):
+        statement = orm_execute_state.statement
+        if orm_execute_state.is_select and statement._for_update_arg is not None:
+            locked.append(statement)
+
+    event.listen(Session, "do_orm_execute", record_locks)
+    try:
+        assert rebalance(router, batch_size=16, dry_run=True) == {"scanned": 40, "moved": len(misplaced)}
+        assert locked == []
+
+        assert rebalance(router, batch_size=16)["moved"] == len(misplaced)
+    finally:
+        event.remove(Session, "do_orm_execute", record_locks)
+
+    locked_ids = set()
+    for statement in locked:
+        params = statement.compile().params
+        locked_ids.update(row_id for value in params.values() if isinstance(value, list) for row_id in value)
+    assert locked and locked_ids == misplaced
+    assert len(codes_on(engines["shard0"])) == 40 - len(misplaced)
+
+
+def test_clicks_during_rebalance_reach_unmoved_rows(monkeypatch):
+    """
+    Tests that with fan-out enabled, click updates still find rows that have
+    not been moved to their new owner yet, and that the rebalance keeps them.
+    """
+    engines = make_engines(3)
+    old_router = ShardRouter({shard_id: engines[shard_id] for shard_id in ("shard0", "shard1")})
+    new_router = ShardRouter(engines, fanout_reads=True)
+    codes = [f"code{i}" for i in range(50)]
+    with sessionmaker(class_=ShardedSession, **old_router.session_options())() as session:
+        session.add_all(URL(short_code=code, original_url="https://example.com", current_clicks=0) for code in codes)
+        session.commit()
+    misplaced = next(code for code in codes if new_router.shard_for(code) != old_router.shard_for(code))
+
+    new_session = sessionmaker(class_=ShardedSession, **new_router.session_options())
+    monkeypatch.setattr(worker, "get_db_session", new_session)
+    worker.apply_clicks([misplaced, misplaced])
+    rebalance(new_router)
+    worker.apply_clicks([misplaced])
+
+    with new_session() as session:
+        assert session.query(URL).filter(URL.short_code == misplaced).one().current_clicks == 3
+    assert misplaced in codes_on(engines[new_router.shard_for(misplaced)])
@@ -0,0 +1,148 @@
+# tests/test_snapshot.py
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from Backend.core.database import Base, get_db
+from Backend.core.sharding import ShardRouter
+from Backend.core.snapshot import (
+    FLAG_CLICK_LIMIT, FLAG_HAS_MAX_AGE, FLAG_PASSWORD, OFFSET, RedirectSnapshot, export_snapshot, get_snapshot, write_snapshot,
+    write_sorted_snapshot
+)
+from Backend.main import app
+from Backend.models.models import URL
+
+
+def test_snapshot_lookup(tmp_path):
+    """
+    Tests that every written entry is found by binary search and that unknown codes miss.
+    """
+    path = str(tmp_path / "redirects.bin")
+    entries = [(f"code{i}", f"https://example.com/{i}", i % 16, (i % 3) * 60) for i in range(500)]
+    write_snapshot(path, entries)
+
+    snapshot = RedirectSnapshot(path, reload_interval=0)
+    assert len(snapshot) == 500
+    for code, url, flags, max_age in entries:
+        # Max-age 0 sem FLAG_HAS_MAX_AGE significa "não definido".
+        expected_max_age = max_age if flags & FLAG_HAS_MAX_AGE or max_age else None
+        assert snapshot.lookup(code) == (url, flags, expected_max_age)
+    assert snapshot.lookup("missing") is None
+    assert snapshot.lookup("") is None
+
+
+def test_snapshot_is_reloaded_after_replace(tmp_path):
+    """
+    Tests that readers pick up a snapshot replaced by the exporter.
+    """
+    path = str(tmp_path / "redirects.bin")
+    snapshot = RedirectSnapshot(path, reload_interval=0)
+    assert snapshot.lookup("abc") is None  # Arquivo ainda não existe
+
+    write_snapshot(path, [("abc", "https://old.example.com", 0, 0)])
+    assert snapshot.lookup("abc").original_url == "https://old.example.com"
+
+    write_snapshot(path, [("abc", "https://new.example.com", 0, 0), ("xyz", "https://xyz.example.com", 0, 0)])
+    assert snapshot.lookup("abc").original_url == "https://new.example.com"
+    assert snapshot.lookup("xyz").original_url == "https://xyz.example.com"
+
+
+def test_export_skips_expired_links(db_session_override, tmp_path):
+    """
+    Tests that the exporter flags protected and limited links and leaves expired ones out.
+    """
+    db_session_override.add_all([
+        URL(short_code="open", original_url="https://open.example.com", max_clicks=0, current_clicks=0),
+        URL(short_code="secret", original_url="https://secret.example.com", password="hash", max_clicks=0, current_clicks=0),
+        URL(short_code="limited", original_url="https://limited.example.com", max_clicks=5, current_clicks=2),
+        URL(short_code="expired", original_url="https://expired.example.com", max_clicks=5, current_clicks=5),
+    ])
+    db_session_override.flush()
+
+    path = str(tmp_path / "redirects.bin")
+    assert export_snapshot(lambda: db_session_override, path) == 3
+
+    snapshot = RedirectSnapshot(path, reload_interval=0)
+    assert snapshot.lookup("open").flags == 0
+    assert snapshot.lookup("secret").flags == FLAG_PASSWORD
+    assert snapshot.lookup("limited").flags == FLAG_CLICK_LIMIT
+    assert snapshot.lookup("expired") is None
+
+
+def test_redirect_served_from_snapshot_when_database_is_down(tmp_path):
+    """
+    Tests that redirects keep working from the snapshot when the database fails.
+    """
+    path = str(tmp_path / "redirects.bin")
+    write_snapshot(path, [
+        ("static", "https://static.example.com", 0, 0),
+        ("limited", "https://limited.example.com", FLAG_CLICK_LIMIT, 0),
+        ("secret", "https://secret.example.com", FLAG_PASSWORD, 0),
+    ])
+    snapshot = RedirectSnapshot(path, reload_interval=0)
+
+    # Banco sem tabelas: toda consulta falha com OperationalError.
+    broken_engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    BrokenSession = sessionmaker(bind=broken_engine)
+
+    app.dependency_overrides[get_db] = lambda: BrokenSession()
+    app.dependency_overrides[get_snapshot] = lambda: snapshot
+    try:
+        with TestClient(app) as client:
+            for code in ("static", "limited"):
+                response = client.get(f"/api/v1/r/{code}", follow_redirects=False)
+                assert response.status_code == 307
+                assert response.headers["location"] == f"https://{code}.example.com"
+
+            assert client.get("/api/v1/r/secret", follow_redirects=False).status_code == 401
+            assert client.get("/api/v1/r/unknown", follow_redirects=False).status_code == 503
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_sharded_export_merges_sorted_shards(tmp_path):
+    """
+    Tests that the exporter merges the shards' ordered streams into one sorted
+    file, with 64-bit offsets and an entry per code even if a row is on two shards.
+    """
+    engines = {}
+    for i in range(3):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        engines[f"shard{i}"] = engine
+    router = ShardRouter(engines)
+    ShardedSessionLocal = sessionmaker(class_=ShardedSession, **router.session_options())
+    codes = [f"code-{i}" for i in range(300)] + ["Zeta", "ação"]
+    with ShardedSessionLocal() as session:
+        session.add_all(URL(short_code=code, original_url=f"https://example.com/{code}", current_clicks=0)
+                        for code in codes)
+        session.commit()
+    # Linha copiada para outro shard e ainda não apagada da origem (rebalanceamento em andamento).
+    with sessionmaker(bind=engines["shard0" if router.shard_for("code-7") != "shard0" else "shard1"])() as session:
+        session.add(URL(short_code="code-7", original_url="https://example.com/code-7", current_clicks=0))
+        session.commit()
+
+    path = str(tmp_path / "redirects.bin")
+    assert export_snapshot(ShardedSessionLocal, path, batch_size=50, shard_ids=list(engines)) == len(codes)
+    assert OFFSET.size == 8
+
+    snapshot = RedirectSnapshot(path, reload_interval=0)
+    assert len(snapshot) == len(codes)
+    for code in codes:
+        assert snapshot.lookup(code).original_url == f"https://example.com/{code}"
+    assert snapshot.lookup("code-9999") is None
+
+
+def test_sorted_writer_rejects_unsorted_input(tmp_path):
+    """
+    Tests that out-of-order input fails without leaving a partial file behind.
+    """
+    path = str(tmp_path / "redirects.bin")
+    with pytest.raises(ValueError):
+        write_sorted_snapshot(path, [("b", "https://b.example.com", 0, 0), ("a", "https://a.example.com", 0, 0)])
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,93 @@
+# tests/test_startup.py
+import json
+import os
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+
+from Backend import main
+from Backend.core.config import Settings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+IMPORT_API = """
+import json, os, signal, sys, threading
+import Backend.main
+from Backend.core import bloom, cache, database
+try:
+    database.SessionLocal()
+    error = None
+except ValueError as e:
+    error = str(e)
+print(json.dumps({
+    "modules": [name for name in ("pika", "passlib") if name in sys.modules],
+    "engines": len(database._engines),
+    "redis_client": cache.redis_client is not None,
+    "bloom_filter": bloom.bloom_filter is not None,
+    "logs_dir": os.path.exists("logs"),
+    "log_writer_thread": any(thread.name == "log-writer" for thread in threading.enumerate()),
+    "sighup_handler": signal.getsignal(signal.SIGHUP) is not signal.SIG_DFL,
+    "session_error": error,
+}))
+"""
+
+
+def test_api_import_has_no_side_effects(tmp_path):
+    """
+    Tests that importing the API without DATABASE_URL opens nothing, starts no
+    thread, installs no signal handler, skips the RabbitMQ and passlib imports,
+    and only reports the missing URL on first use.
+    """
+    env = {key: value for key, value in os.environ.items() if key not in ("DATABASE_URL", "SHARD_DATABASE_URLS")}
+    env["PYTHONPATH"] = ROOT
+    env["LOG_LEVELS_FILE"] = str(tmp_path / "levels.conf")
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_API], cwd=tmp_path, env=env, capture_output=True, text=True, check=True
+    )
+    state = json.loads(result.stdout.strip().splitlines()[-1])
+
+    assert state == {
+        "modules": [],
+        "engines": 0,
+        "redis_client": False,
+        "bloom_filter": False,
+        "logs_dir": False,
+        "log_writer_thread": False,
+        "sighup_handler": False,
+        "session_error": "DATABASE_URL environment variable not set",
+    }
+
+
+def test_settings_read_environment(monkeypatch):
+    """
+    Tests typed parsing of the settings and the single-shard DATABASE_URL fallback.
+    """
+    monkeypatch.delenv("SHARD_DATABASE_URLS", raising=False)
+    monkeypatch.setenv("DATABASE_URL", "postgresql://db/app")
+    monkeypatch.setenv("CLICK_PARTITIONS", "4")
+    monkeypatch.setenv("LOG_ENQUEUE", "false")
+    monkeypatch.setenv("CLICK_TRANSPORT", "Redis")
+
+    settings = Settings()
+    assert settings.click_partitions == 4
+    assert settings.log_enqueue is False
+    assert settings.click_transport == "redis"
+    assert settings.database_urls == ["postgresql://db/app"]
+
+    monkeypatch.setenv("SHARD_DATABASE_URLS", "postgresql://a/app, postgresql://b/app")
+    assert Settings().database_urls == ["postgresql://a/app", "postgresql://b/app"]
+
+
+def test_lifespan_closes_clients_on_shutdown(monkeypatch):
+    """
+    Tests that leaving the application closes the lazily created clients.
+    """
+    closed = []
+    monkeypatch.setattr(main, "dispose_engines", lambda: closed.append("database"))
+    monkeypatch.setattr(main, "close_cache", lambda: closed.append("redis"))
+
+    with TestClient(main.app) as client:
+        assert client.get("/").status_code == 200
+        assert closed == []
+    assert closed == ["database", "redis"]
@@ -1,9 +1,3 @@
-from dotenv import load_dotenv
-import os
-load_dotenv()
-
-print(f"DEBUG: DATABASE_URL lida do ambiente: {os.getenv('DATABASE_URL')}")
-
 from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config
@@ -11,6 +5,7 @@ from sqlalchemy import pool
 
 from alembic import context
 
+from Backend.core.config import settings
 from Backend.core.database import Base
 from Backend.models.models import URL
 
@@ -69,25 +64,27 @@ def run_migrations_online() -> None:
     """
     config_section = config.get_section(config.config_ini_section)
 
-    db_url = os.getenv("DATABASE_URL")
-    if not db_url:
+    # Com SHARD_DATABASE_URLS definida, cada shard recebe as mesmas migrações.
+    db_urls = settings.database_urls
+    if not db_urls:
         raise ValueError("A variável de ambiente DATABASE_URL não foi definida.")
 
-    config_section["sqlalchemy.url"] = db_url
+    for db_url in db_urls:
+        config_section["sqlalchemy.url"] = db_url
 
-    connectable = engine_from_config(
-        config_section,
-        prefix="sqlalchemy.",
-        poolclass=pool.NullPool,
-    )
-
-    with connectable.connect() as connection:
-        context.configure(
-            connection=connection, target_metadata=target_metadata
+        connectable = engine_from_config(
+            config_section,
+            prefix="sqlalchemy.",
+            poolclass=pool.NullPool,
         )
 
-        with context.begin_transaction():
-            context.run_migrations()
+        with connectable.connect() as connection:
+            context.configure(
+                connection=connection, target_metadata=target_metadata
+            )
+
+            with context.begin_transaction():
+                context.run_migrations()
 
 
 if context.is_offline_mode():
@@ -0,0 +1,30 @@
+"""Add redirect policy to URL model
+
+Revision ID: b5d8e2f1a6c7
+Revises: 4e7a1c2b9d3f
+Create Date: 2026-10-19 14:03:27.904512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5d8e2f1a6c7'
+down_revision: Union[str, Sequence[str], None] = '4e7a1c2b9d3f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('urls', sa.Column('redirect_policy', sa.String(), server_default='temporary', nullable=False))
+    op.add_column('urls', sa.Column('cache_max_age', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('urls', 'cache_max_age')
+    op.drop_column('urls', 'redirect_policy')
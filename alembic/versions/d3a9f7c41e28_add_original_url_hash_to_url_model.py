@@ -0,0 +1,74 @@
+"""Add original_url_hash to URL model
+
+Revision ID: d3a9f7c41e28
+Revises: b5d8e2f1a6c7
+Create Date: 2026-10-19 16:21:09.552716
+
+Safe on a live table: the column is added as nullable, existing rows are
+hashed in small batches outside of the migration transaction, and on
+Postgres the index is built with CREATE INDEX CONCURRENTLY, so writes are
+never blocked for longer than a single UPDATE.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from Backend.core.dedup import destination_hash
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3a9f7c41e28'
+down_revision: Union[str, Sequence[str], None] = 'b5d8e2f1a6c7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+urls = sa.table(
+    'urls',
+    sa.column('id', sa.Integer),
+    sa.column('original_url', sa.String),
+    sa.column('original_url_hash', sa.String),
+)
+
+
+def backfill_hashes(connection) -> int:
+    """
+    Hashes every row without a hash, walking the primary key in batches.
+    Runs in autocommit mode, so no row lock outlives its own UPDATE.
+    """
+    last_id, total = 0, 0
+    while True:
+        rows = connection.execute(
+            sa.select(urls.c.id, urls.c.original_url)
+            .where(urls.c.id > last_id, urls.c.original_url_hash.is_(None))
+            .order_by(urls.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return total
+        connection.execute(
+            urls.update().where(urls.c.id == sa.bindparam('row_id')).values(original_url_hash=sa.bindparam('url_hash')),
+            [{'row_id': row.id, 'url_hash': destination_hash(row.original_url)} for row in rows],
+        )
+        last_id, total = rows[-1].id, total + len(rows)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('urls', sa.Column('original_url_hash', sa.String(length=64), nullable=True))
+    # Fora da transação da migração: nada fica travado até o fim e o índice pode ser CONCURRENTLY.
+    with op.get_context().autocommit_block():
+        backfill_hashes(op.get_bind())
+        op.create_index(
+            op.f('ix_urls_original_url_hash'), 'urls', ['original_url_hash'], unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(op.f('ix_urls_original_url_hash'), table_name='urls', postgresql_concurrently=True)
+    op.drop_column('urls', 'original_url_hash')
@@ -0,0 +1,33 @@
+"""Add click counting policy to URL model
+
+Revision ID: f1c6a8d2b4e9
+Revises: d3a9f7c41e28
+Create Date: 2026-10-19 18:42:51.317204
+
+Permanent links created before this revision were counted through the
+beacon endpoint only, so they are marked "beacon" to keep pages that
+already send beacons from counting each click twice. Every other link
+keeps counting its redirects ("origin").
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1c6a8d2b4e9'
+down_revision: Union[str, Sequence[str], None] = 'd3a9f7c41e28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('urls', sa.Column('click_counting', sa.String(), server_default='origin', nullable=False))
+    op.execute("UPDATE urls SET click_counting = 'beacon' WHERE redirect_policy = 'permanent'")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('urls', 'click_counting')
@@ -0,0 +1,99 @@
+# benchmarks/bench_click_transport.py
+"""
+Compares the RabbitMQ and Redis Streams click transports.
+
+For each transport it publishes N click events in relay-sized batches and
+measures publish throughput plus end-to-end time until a consumer has
+received every event. Uses dedicated queue/stream names, removed at the end.
+Needs RABBITMQ_URL, REDIS_HOST and REDIS_PORT pointing at running services.
+
+Usage:
+    python benchmarks/bench_click_transport.py [--events 50000] [--batch-size 500]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pika  # noqa: E402
+from Backend.core.messaging import RABBITMQ_URL, AmqpClickTransport, RedisStreamClickTransport  # noqa: E402
+
+BENCH_NAME = "bench_click_events"
+
+
+class _Done(Exception):
+    """Stops the consumer loop once every event was received."""
+
+
+def measure(make_transport, events: int, batch_size: int) -> dict:
+    received = [0]
+    finished = threading.Event()
+
+    def handle_batch(short_codes):
+        received[0] += len(short_codes)
+        if received[0] >= events:
+            finished.set()
+            raise _Done()
+
+    def consume():
+        consumer = make_transport()
+        try:
+            consumer.consume(handle_batch)
+        except _Done:
+            pass
+        finally:
+            consumer.close()
+
+    thread = threading.Thread(target=consume, daemon=True)
+    thread.start()
+    time.sleep(1)  # Deixa o consumidor declarar a fila / o grupo
+
+    producer = make_transport()
+    codes = [f"b{i:07d}" for i in range(events)]
+    started = time.perf_counter()
+    for i in range(0, events, batch_size):
+        producer.publish_clicks(codes[i:i + batch_size])
+    published = time.perf_counter()
+    finished.wait(timeout=300)
+    delivered = time.perf_counter()
+    producer.close()
+    thread.join(timeout=10)
+
+    return {
+        "publish_per_second": events / (published - started),
+        "end_to_end_seconds": delivered - started,
+        "received": received[0],
+    }
+
+
+def cleanup():
+    connection = pika.BlockingConnection(pika.URLParameters(RABBITMQ_URL))
+    connection.channel().queue_delete(queue=BENCH_NAME)
+    connection.close()
+    stream = RedisStreamClickTransport(key=BENCH_NAME)
+    stream.client.delete(BENCH_NAME)
+    stream.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the click event transports.")
+    parser.add_argument("--events", type=int, default=50000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    transports = {
+        "amqp": lambda: AmqpClickTransport(queue=BENCH_NAME, batch_size=args.batch_size, batch_wait=0.2),
+        "redis": lambda: RedisStreamClickTransport(key=BENCH_NAME, group=BENCH_NAME, batch_size=args.batch_size,
+                                                   batch_wait=0.2),
+    }
+    print(f"{'transport':<10} {'publish/s':>12} {'end-to-end (s)':>16} {'received':>10}")
+    try:
+        for name, make_transport in transports.items():
+            result = measure(make_transport, args.events, args.batch_size)
+            print(f"{name:<10} {result['publish_per_second']:>12,.0f} "
+                  f"{result['end_to_end_seconds']:>16.2f} {result['received']:>10}")
+    finally:
+        cleanup()
@@ -0,0 +1,146 @@
+# benchmarks/bench_import_time.py
+"""
+Measures the import time of each process role with `python -X importtime`,
+in fresh interpreters, and lists the heaviest top-level packages it pulls in.
+
+    api                Backend.main (uvicorn imports this before serving)
+    worker             click consumer
+    outbox_relay       outbox relay
+    snapshot_exporter  redirect snapshot job
+    telegram_bot       Telegram alert bot
+    discord_bot        Discord alert bot
+
+With --compare REF the same roles are measured on a checkout of a git ref
+(e.g. the commit before the lazy-startup change), extracted with git archive
+into a temporary directory. Importing older trees needed DATABASE_URL set, so
+a throwaway sqlite:// URL is supplied when none is configured; no connection
+is opened either way.
+
+Usage:
+    python benchmarks/bench_import_time.py [--runs 7] [--top 8] [--compare REF]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tarfile
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ROLES = {
+    "api": "Backend.main",
+    "worker": "worker",
+    "outbox_relay": "outbox_relay",
+    "snapshot_exporter": "snapshot_exporter",
+    "telegram_bot": "telegram_bot",
+    "discord_bot": "discord_bot",
+}
+
+LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| *(\S+)$")
+
+
+def import_once(module: str, cwd: str) -> Optional[Tuple[int, Dict[str, int]]]:
+    """
+    Imports `module` in a new interpreter. Returns its cumulative import time
+    and the time spent in each top-level package, in microseconds, or
+    None if the import failed (e.g. an optional bot dependency is missing).
+    """
+    env = {**os.environ, "PYTHONPATH": cwd}
+    env.setdefault("DATABASE_URL", "sqlite://")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        return None
+    total = 0
+    packages: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if not match:
+            continue
+        own, cumulative, name = int(match.group(1)), int(match.group(2)), match.group(3)
+        if name == module:
+            total = cumulative
+        # Tempo próprio somado por pacote raiz: quanto cada dependência custa no total.
+        top = name.split(".")[0]
+        packages[top] = packages.get(top, 0) + own
+    return total, packages
+
+
+def measure(trees: Dict[str, str], runs: int) -> Dict[str, Dict[str, Optional[Tuple[float, List[Tuple[str, int]]]]]]:
+    """
+    Median import time (ms) per tree and role, and the packages of the median
+    run. Runs of the trees are interleaved so machine noise hits them alike.
+    """
+    samples = {tree: {role: [] for role in ROLES} for tree in trees}
+    for _ in range(runs):
+        for role, module in ROLES.items():
+            for tree, cwd in trees.items():
+                samples[tree][role].append(import_once(module, cwd))
+    results = {}
+    for tree, roles in samples.items():
+        results[tree] = {}
+        for role, runs_of_role in roles.items():
+            if any(sample is None for sample in runs_of_role):
+                results[tree][role] = None
+                continue
+            runs_of_role.sort(key=lambda sample: sample[0])
+            total, packages = runs_of_role[len(runs_of_role) // 2]
+            heaviest = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+            results[tree][role] = (total / 1000, heaviest)
+    return results
+
+
+def extract(ref: str, directory: str):
+    archive = os.path.join(directory, "tree.tar")
+    with open(archive, "wb") as f:
+        subprocess.run(["git", "archive", ref], cwd=ROOT, stdout=f, check=True)
+    with tarfile.open(archive) as tar:
+        tar.extractall(directory)
+    os.remove(archive)
+
+
+def print_packages(results, top: int):
+    for role, result in results.items():
+        if result is None:
+            continue
+        packages = ", ".join(f"{name} {us / 1000:.0f}ms" for name, us in result[1][:top])
+        print(f"  {role:<18} {packages}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark import time per process role.")
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--compare", metavar="REF", help="git ref to measure against")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        trees = {"current": ROOT}
+        if args.compare:
+            extract(args.compare, directory)
+            trees["baseline"] = directory
+        results = measure(trees, args.runs)
+    current, baseline = results["current"], results.get("baseline")
+
+    def cell(result) -> str:
+        return "n/a" if result is None else f"{result[0]:.0f}ms"
+
+    header = f"{'role':<18} {'current':>9}"
+    if baseline is not None:
+        header += f" {args.compare[:12]:>12} {'change':>8}"
+    print(header)
+    for role in ROLES:
+        line = f"{role:<18} {cell(current[role]):>9}"
+        if baseline is not None:
+            line += f" {cell(baseline[role]):>12}"
+            if current[role] and baseline[role]:
+                line += f" {(current[role][0] / baseline[role][0] - 1) * 100:>+7.0f}%"
+        print(line)
+
+    print("\nHeaviest top-level imports (current):")
+    print_packages(current, args.top)
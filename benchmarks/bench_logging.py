@@ -0,0 +1,115 @@
+# benchmarks/bench_logging.py
+"""
+Measures the per-request cost of the redirect log line under different
+logging setups, writing to os.devnull so only the logging overhead counts.
+
+    legacy         synchronous sink, f-string `log.info` (previous call site)
+    sync           synchronous sink, lazy "{}" `log.info`
+    enqueue        BackgroundWriter sink (written by a thread), lazy `log.info`
+    json           same as enqueue with the compact JSON format
+    hot_unlimited  enqueue + SampledLogger without sampling or rate limit
+    hot_default    enqueue + SampledLogger with the shipped defaults
+                   (LOG_SAMPLE_RATE, LOG_RATE_LIMIT lines/s per call site)
+    sampled        enqueue + SampledLogger keeping 1% of the lines
+    filtered       shipped SampledLogger after the module level was raised to WARNING at runtime
+
+All sinks use the same uncolored text format (except json), so the arms
+only differ in what the table says. Every arm runs --runs times and the
+median is reported; differences smaller than the spread between runs are
+noise. "caller" is the time spent in the request thread; "total" also waits
+for the background writer to drain, i.e. the CPU cost of the whole
+pipeline. hot_default only saves anything once a call site logs faster than
+LOG_RATE_LIMIT lines per second, which this loop does.
+
+Usage:
+    python benchmarks/bench_logging.py [--calls 50000] [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Backend.core import logger as logging_setup  # noqa: E402
+from Backend.core.logger import BackgroundWriter, SampledLogger, log  # noqa: E402
+
+
+def add_sink(stream, enqueue: bool, json_mode: bool = False):
+    writer = BackgroundWriter(stream) if enqueue else None
+    handler = log.add(
+        writer or stream,
+        level="DEBUG",
+        format=logging_setup._json_format if json_mode else logging_setup.TEXT_FORMAT,
+        colorize=False,
+        filter=logging_setup._module_filter,
+    )
+    return handler, writer
+
+
+def timed(calls: int, emit, writer=None):
+    started = time.perf_counter()
+    for i in range(calls):
+        emit(f"c{i:06d}")
+    caller = time.perf_counter() - started
+    while writer is not None and not writer._queue.empty():
+        time.sleep(0.001)
+    total = time.perf_counter() - started
+    return caller / calls * 1e6, total / calls * 1e6
+
+
+def run_arms(calls: int, devnull) -> dict:
+    """One measurement of every arm: name -> (caller us, total us)."""
+    lazy = "Click event for '{}' queued successfully."
+    results = {}
+
+    handler, _ = add_sink(devnull, enqueue=False)
+    results["legacy"] = timed(calls, lambda code: log.info(f"Click event for '{code}' published successfully."))
+    results["sync"] = timed(calls, lambda code: log.info(lazy, code))
+    log.remove(handler)
+
+    handler, writer = add_sink(devnull, enqueue=True)
+    results["enqueue"] = timed(calls, lambda code: log.info(lazy, code), writer)
+    log.remove(handler)
+
+    handler, writer = add_sink(devnull, enqueue=True, json_mode=True)
+    results["json"] = timed(calls, lambda code: log.info(lazy, code), writer)
+    log.remove(handler)
+
+    handler, writer = add_sink(devnull, enqueue=True)
+    unlimited = SampledLogger(sample_rate=1.0, max_per_second=0)
+    results["hot_unlimited"] = timed(calls, lambda code: unlimited.info(lazy, code), writer)
+    shipped = SampledLogger()
+    results["hot_default"] = timed(calls, lambda code: shipped.info(lazy, code), writer)
+    sampled = SampledLogger(sample_rate=0.01, max_per_second=0)
+    results["sampled"] = timed(calls, lambda code: sampled.info(lazy, code), writer)
+
+    logging_setup.set_module_level("__main__", "WARNING")
+    silenced = SampledLogger()
+    results["filtered"] = timed(calls, lambda code: silenced.info(lazy, code), writer)
+    logging_setup._module_levels.pop("__main__")
+    logging_setup._resolved_levels.clear()
+    log.remove(handler)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the logging overhead per redirect.")
+    parser.add_argument("--calls", type=int, default=50000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    log.remove()
+    runs = []
+    with open(os.devnull, "w") as devnull:
+        for _ in range(args.runs):
+            runs.append(run_arms(args.calls, devnull))
+
+    print(f"LOG_SAMPLE_RATE={logging_setup.LOG_SAMPLE_RATE} LOG_RATE_LIMIT={logging_setup.LOG_RATE_LIMIT}")
+    print(f"{'setup':<14} {'caller us':>10} {'total us':>10} {'spread us':>10}")
+    for name in runs[0]:
+        callers = [run[name][0] for run in runs]
+        totals = [run[name][1] for run in runs]
+        spread = max(callers) - min(callers)
+        print(f"{name:<14} {statistics.median(callers):>10.2f} {statistics.median(totals):>10.2f} {spread:>10.2f}")
@@ -0,0 +1,110 @@
+# benchmarks/bench_worker_scaling.py
+"""
+Measures click-apply throughput of the worker against the real database
+with 1..N processes, with and without partitioning.
+
+    partitioned   each process applies only the codes of its partition
+                  (ClickPartitioner), as the worker supervisor does
+    shared        every process takes batches from the same mixed stream,
+                  as plain worker replicas on one queue would
+
+Traffic is skewed: most clicks hit a few hot codes, so the shared mode
+contends on the same `urls` rows while the partitioned one does not. The
+broker is left out on purpose; only the database side of apply_clicks is
+measured. Needs DATABASE_URL (or SHARD_DATABASE_URLS) pointing at a migrated
+database; the benchmark rows are removed at the end.
+
+Usage:
+    python benchmarks/bench_worker_scaling.py [--events 200000] [--codes 1000] [--max-processes 8]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Backend.core.database import SessionLocal, dispose_engines  # noqa: E402
+from Backend.core.logger import set_module_level  # noqa: E402
+from Backend.core.messaging import ClickPartitioner  # noqa: E402
+from Backend.models.models import URL  # noqa: E402
+import worker  # noqa: E402
+
+BENCH_PREFIX = "bench-scale-"
+BATCH_SIZE = 200
+
+
+def make_events(events: int, codes: int):
+    """Zipf-like skew: code i gets weight 1/(i+1)."""
+    population = [f"{BENCH_PREFIX}{i}" for i in range(codes)]
+    weights = [1 / (i + 1) for i in range(codes)]
+    return random.Random(42).choices(population, weights=weights, k=events)
+
+
+def apply_all(short_codes):
+    dispose_engines(close=False)
+    for i in range(0, len(short_codes), BATCH_SIZE):
+        worker.apply_clicks(short_codes[i:i + BATCH_SIZE])
+
+
+def run(events, processes: int, partitioned: bool) -> float:
+    if partitioned:
+        groups = ClickPartitioner(processes).split(events)
+        shares = [groups.get(partition, []) for partition in range(processes)]
+    else:
+        shares = [events[i::processes] for i in range(processes)]
+    context = multiprocessing.get_context("fork")
+    started = time.perf_counter()
+    children = [context.Process(target=apply_all, args=(share,)) for share in shares]
+    for child in children:
+        child.start()
+    for child in children:
+        child.join()
+    return len(events) / (time.perf_counter() - started)
+
+
+def reset_rows(codes: int):
+    db = SessionLocal()
+    try:
+        db.query(URL).filter(URL.short_code.like(f"{BENCH_PREFIX}%")).delete(synchronize_session=False)
+        db.add_all(URL(short_code=f"{BENCH_PREFIX}{i}", original_url="https://example.com", current_clicks=0)
+                   for i in range(codes))
+        db.commit()
+    finally:
+        db.close()
+
+
+def cleanup():
+    db = SessionLocal()
+    try:
+        db.query(URL).filter(URL.short_code.like(f"{BENCH_PREFIX}%")).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark click worker scaling.")
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--codes", type=int, default=1000)
+    parser.add_argument("--max-processes", type=int, default=os.cpu_count() or 4)
+    args = parser.parse_args()
+
+    set_module_level("worker", "WARNING")
+    events = make_events(args.events, args.codes)
+    counts = [1]
+    while counts[-1] * 2 <= args.max_processes:
+        counts.append(counts[-1] * 2)
+
+    print(f"{'processes':>9} {'partitioned/s':>14} {'shared/s':>10}")
+    try:
+        for processes in counts:
+            reset_rows(args.codes)
+            partitioned = run(events, processes, partitioned=True)
+            reset_rows(args.codes)
+            shared = run(events, processes, partitioned=False)
+            print(f"{processes:>9} {partitioned:>14,.0f} {shared:>10,.0f}")
+    finally:
+        cleanup()
@@ -1,23 +1,21 @@
 # discord_bot.py
-import os
 import discord
 import json
 import pika
 import threading
 import time
 import asyncio
-from dotenv import load_dotenv
 from sqlalchemy.orm import Session
+from Backend.core.config import settings
 from Backend.core.database import SessionLocal
 from Backend.models.models import URL
 from Backend.core.logger import log
 
 # -- Initial Setup --
-load_dotenv()
-DISCORD_BOT_TOKEN = os.getenv("DISCORD_BOT_TOKEN")
-DISCORD_GUILD_ID = os.getenv("DISCORD_GUILD_ID")
-DISCORD_CHANNEL_ID = os.getenv("DISCORD_CHANNEL_ID") # Channel for alerts
-RABBITMQ_URL = os.getenv("RABBITMQ_URL")
+DISCORD_BOT_TOKEN = settings.discord_bot_token
+DISCORD_GUILD_ID = settings.discord_guild_id
+DISCORD_CHANNEL_ID = settings.discord_channel_id # Channel for alerts
+RABBITMQ_URL = settings.rabbitmq_url
 ALERT_QUEUE_NAME = "alerts_queue"
 ALERT_EXCHANGE_NAME = "alerts_exchange"
 
@@ -0,0 +1,114 @@
+# outbox_relay.py
+"""
+Outbox relay: drains the `outbox_events` table of every shard and the local
+event log segments (Backend/core/outbox.py) into RabbitMQ, in batches, over a
+single long-lived channel, one AMQP transaction per batch. Click events go through
+the configured click transport instead (RabbitMQ or Redis Streams, see
+CLICK_TRANSPORT). Events are deleted only after they were accepted, so
+delivery is at-least-once. While the RabbitMQ (or Redis) circuit breaker is
+open the relay stops trying and the events simply keep accumulating in the
+outbox until the dependency is back.
+"""
+import os
+import time
+from typing import Callable, List
+from sqlalchemy.orm import Session
+from Backend.core.config import settings
+from Backend.core.database import get_engines
+from Backend.core.logger import install_reload_handler, log, hot_log
+from Backend.core.messaging import CLICK_QUEUE_NAME, BatchPublisher, ClickTransport, get_click_transport
+from Backend.core.outbox import Event, EventLog, event_log
+from Backend.core.resilience import CircuitOpenError
+from Backend.models.models import OutboxEvent
+
+OUTBOX_BATCH_SIZE = settings.outbox_batch_size
+OUTBOX_POLL_INTERVAL = settings.outbox_poll_interval
+
+PublishBatch = Callable[[List[Event]], None]
+
+
+def drain_table(engine, publish_batch: PublishBatch, batch_size: int = OUTBOX_BATCH_SIZE) -> int:
+    """
+    Relays one batch of outbox rows from a shard.
+    SKIP LOCKED lets several relays run side by side without double sending.
+    """
+    with Session(bind=engine) as db:
+        rows = (
+            db.query(OutboxEvent)
+            .order_by(OutboxEvent.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        if not rows:
+            return 0
+        publish_batch([(row.exchange, row.routing_key, row.body) for row in rows])
+        db.query(OutboxEvent).filter(OutboxEvent.id.in_([row.id for row in rows])).delete(synchronize_session=False)
+        db.commit()
+        return len(rows)
+
+
+def drain_event_log(log_store: EventLog, publish_batch: PublishBatch, batch_size: int = OUTBOX_BATCH_SIZE) -> int:
+    """
+    Relays every closed segment of the local event log, deleting each file
+    once all of its events were confirmed.
+    """
+    relayed = 0
+    for path in log_store.closed_segments():
+        batch: List[Event] = []
+        for event in log_store.read_segment(path):
+            batch.append(event)
+            if len(batch) >= batch_size:
+                publish_batch(batch)
+                relayed += len(batch)
+                batch = []
+        if batch:
+            publish_batch(batch)
+            relayed += len(batch)
+        os.remove(path)
+    return relayed
+
+
+def make_publish_batch(publisher: BatchPublisher, click_transport: ClickTransport) -> PublishBatch:
+    """Routes click events to the click transport and everything else to RabbitMQ."""
+    def publish_batch(events: List[Event]):
+        clicks = [body for exchange, routing_key, body in events if not exchange and routing_key == CLICK_QUEUE_NAME]
+        others = [event for event in events if event[0] or event[1] != CLICK_QUEUE_NAME]
+        if others:
+            publisher.publish_batch(others)
+        if clicks:
+            click_transport.publish_clicks(clicks)
+    return publish_batch
+
+
+def run_relay():
+    """Main loop; on broker errors the events stay in the outbox and are retried."""
+    publisher = BatchPublisher()
+    click_transport = get_click_transport()
+    publish_batch = make_publish_batch(publisher, click_transport)
+    log.info(f"Outbox relay started (click transport: '{click_transport.name}').")
+    while True:
+        try:
+            relayed = drain_event_log(event_log, publish_batch)
+            for shard_id, engine in get_engines().items():
+                relayed += drain_table(engine, publish_batch)
+            if relayed:
+                hot_log.info("Relayed {} outbox events.", relayed)
+            else:
+                time.sleep(OUTBOX_POLL_INTERVAL)
+        except CircuitOpenError as e:
+            hot_log.debug("{}; events stay buffered in the outbox.", e)
+            time.sleep(OUTBOX_POLL_INTERVAL)
+        except KeyboardInterrupt:
+            log.info("Outbox relay interrupted by user.")
+            break
+        except Exception as e:
+            log.error(f"Outbox relay failed, retrying in 5 seconds. Error: {e}")
+            time.sleep(5)
+    publisher.close()
+    click_transport.close()
+
+
+if __name__ == '__main__':
+    install_reload_handler()
+    run_relay()
@@ -0,0 +1,140 @@
+# rebalance_shards.py
+"""
+Online rebalancing tool for the sharded `urls` table.
+
+After adding a shard to SHARD_DATABASE_URLS, every row whose short_code now
+hashes to a different shard is copied to its new owner and then removed from
+the old one, in small batches with one short transaction per batch, while the
+API keeps serving. Run the API and the worker with SHARD_FANOUT_READS=true
+until this tool finishes, so lookups still find rows that have not been moved
+yet and click updates reach them wherever they are (see
+ShardRouter.execute_chooser).
+
+Usage:
+    python rebalance_shards.py [--batch-size 500] [--dry-run]
+"""
+import argparse
+from typing import Dict, List
+from sqlalchemy.orm import Session
+from Backend.core.database import get_shard_router
+from Backend.core.dedup import destination_hash
+from Backend.core.sharding import ShardRouter
+from Backend.models.models import URL
+from Backend.core.logger import log
+
+# Todas as colunas exceto o id (local a cada shard): colunas novas do modelo são copiadas sem precisar lembrar daqui.
+COPIED_COLUMNS = tuple(column.key for column in URL.__table__.columns if column.key != "id")
+
+
+def copy_rows(target_engine, rows: List[URL]):
+    """
+    Inserts the given rows into the target shard, skipping codes that are
+    already there (left behind by an interrupted previous run).
+    """
+    codes = [row.short_code for row in rows]
+    with Session(bind=target_engine) as target:
+        existing = {code for (code,) in target.query(URL.short_code).filter(URL.short_code.in_(codes))}
+        for row in rows:
+            if row.short_code not in existing:
+                target.add(URL(**{column: getattr(row, column) for column in COPIED_COLUMNS}))
+        target.commit()
+
+
+def fill_missing_hashes(router: ShardRouter, batch_size: int = 500) -> int:
+    """
+    Hashes rows left without original_url_hash (e.g. moved by an older
+    version of this tool, which dropped the column), so dedup finds them again.
+    """
+    total = 0
+    for shard_id, engine in router.engines.items():
+        last_id = 0
+        while True:
+            with Session(bind=engine) as session:
+                rows = (
+                    session.query(URL)
+                    .filter(URL.id > last_id, URL.original_url_hash.is_(None))
+                    .order_by(URL.id)
+                    .limit(batch_size)
+                    .all()
+                )
+                if not rows:
+                    break
+                for row in rows:
+                    row.original_url_hash = destination_hash(row.original_url)
+                session.commit()
+                last_id = rows[-1].id
+                total += len(rows)
+        log.info(f"Hashed rows without original_url_hash on '{shard_id}' (up to id {last_id}).")
+    return total
+
+
+def move_rows(router: ShardRouter, source_engine, row_ids: List[int]) -> int:
+    """
+    Locks the given rows on their current shard (FOR UPDATE), copies them to
+    their owners and deletes them, in one transaction. Rows deleted since
+    they were selected are skipped. Returns how many rows moved.
+    """
+    with Session(bind=source_engine) as source:
+        rows = source.query(URL).filter(URL.id.in_(row_ids)).order_by(URL.id).with_for_update().all()
+        misplaced: Dict[str, List[URL]] = {}
+        for row in rows:
+            misplaced.setdefault(router.shard_for(row.short_code), []).append(row)
+        for target_id, batch in misplaced.items():
+            copy_rows(router.engines[target_id], batch)
+            for row in batch:
+                source.delete(row)
+        source.commit()
+    return len(rows)
+
+
+def rebalance(router: ShardRouter, batch_size: int = 500, dry_run: bool = False) -> Dict[str, int]:
+    """
+    Moves misplaced rows to the shard that owns them under the current ring.
+    Each batch is scanned without locks; only the rows that must move are
+    then locked (see move_rows), so click updates on every other row never
+    wait for a copy, and a dry run takes no locks at all. Rows are copied
+    before they are deleted, so an interrupted run never loses data and can
+    simply be started again.
+    """
+    stats = {"scanned": 0, "moved": 0}
+    for source_id, source_engine in router.engines.items():
+        last_id = 0
+        while True:
+            with Session(bind=source_engine) as source:
+                rows = (
+                    source.query(URL.id, URL.short_code)
+                    .filter(URL.id > last_id)
+                    .order_by(URL.id)
+                    .limit(batch_size)
+                    .all()
+                )
+            if not rows:
+                break
+            last_id = rows[-1].id
+            stats["scanned"] += len(rows)
+
+            # O short_code nunca muda, então a decisão tomada sem lock continua valendo.
+            misplaced_ids = [row.id for row in rows if router.shard_for(row.short_code) != source_id]
+            if dry_run:
+                stats["moved"] += len(misplaced_ids)
+                continue
+            if misplaced_ids:
+                moved = move_rows(router, source_engine, misplaced_ids)
+                stats["moved"] += moved
+                log.info(f"Moved {moved} rows out of '{source_id}' (up to id {last_id}).")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move urls rows to the shard that owns them.")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="Only count the rows that would move.")
+    args = parser.parse_args()
+
+    router = get_shard_router()
+    result = rebalance(router, batch_size=args.batch_size, dry_run=args.dry_run)
+    action = "would move" if args.dry_run else "moved"
+    log.info(f"Rebalance finished: scanned {result['scanned']} rows, {action} {result['moved']}.")
+    if not args.dry_run:
+        hashed = fill_missing_hashes(router, batch_size=args.batch_size)
+        log.info(f"Filled original_url_hash on {hashed} rows.")
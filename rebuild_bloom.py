@@ -0,0 +1,40 @@
+# rebuild_bloom.py
+"""
+Rebuilds the short code Bloom filter (Backend/core/bloom.py) by streaming
+every short_code from all shards, then marks the filter ready. The snapshot
+exporter does the same on its own whenever the filter is not ready; this
+script forces a rebuild, e.g. after changing BLOOM_CAPACITY.
+
+Usage:
+    python rebuild_bloom.py [--batch-size 10000]
+"""
+import argparse
+from Backend.core.bloom import get_bloom_filter
+from Backend.core.database import SessionLocal
+from Backend.models.models import URL
+from Backend.core.logger import log
+
+
+def stream_short_codes(batch_size: int):
+    """Yields every short code without loading the whole table in memory."""
+    db = SessionLocal()
+    try:
+        for (short_code,) in db.query(URL.short_code).yield_per(batch_size):
+            yield short_code
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the short code Bloom filter from the urls table.")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    bloom_filter = get_bloom_filter()
+    total = bloom_filter.rebuild(stream_short_codes(args.batch_size), batch_size=args.batch_size)
+    stats = bloom_filter.stats()
+    log.info(
+        f"Bloom filter rebuilt with {total} codes. "
+        f"Fill ratio: {stats.get('fill_ratio', 0):.4f}, "
+        f"estimated false-positive rate: {stats['estimated_false_positive_rate']}"
+    )
@@ -0,0 +1,54 @@
+# snapshot_exporter.py
+"""
+Background job that periodically rebuilds the redirect snapshot read by the API
+(see Backend/core/snapshot.py). On the same schedule it rebuilds the short code
+Bloom filter whenever it is not ready: never built, or invalidated by an insert
+that could not be added to it (see Backend/core/bloom.py).
+"""
+import time
+from Backend.core.bloom import get_bloom_filter
+from Backend.core.config import settings
+from Backend.core.database import SessionLocal, get_engines
+from Backend.core.logger import install_reload_handler, log
+from Backend.core.snapshot import SNAPSHOT_PATH, export_snapshot
+from rebuild_bloom import stream_short_codes
+
+SNAPSHOT_INTERVAL = settings.snapshot_interval
+BLOOM_REBUILD_BATCH = 10000
+
+def refresh_bloom_filter(bloom=None):
+    """Rebuilds the Bloom filter if it is not ready. Redis errors are logged, not raised."""
+    bloom = bloom or get_bloom_filter()
+    try:
+        total = bloom.rebuild_if_needed(lambda: stream_short_codes(BLOOM_REBUILD_BATCH), BLOOM_REBUILD_BATCH)
+    except Exception as e:
+        log.error(f"Failed to rebuild the Bloom filter. Error: {e}")
+        return
+    if total is not None:
+        log.info(f"Bloom filter was not ready; rebuilt it with {total} codes.")
+
+def run_exporter():
+    """Exports a new snapshot (and repairs the Bloom filter) every SNAPSHOT_INTERVAL seconds."""
+    while True:
+        started = time.monotonic()
+        try:
+            count = export_snapshot(SessionLocal, SNAPSHOT_PATH, shard_ids=list(get_engines()))
+            elapsed = time.monotonic() - started
+            log.info(f"Redirect snapshot written to '{SNAPSHOT_PATH}' with {count} entries in {elapsed:.2f}s.")
+        except KeyboardInterrupt:
+            log.info("Snapshot exporter interrupted by user.")
+            break
+        except Exception as e:
+            # Em caso de falha, o snapshot anterior continua válido para a API.
+            log.error(f"Failed to export redirect snapshot. Error: {e}")
+        # Independente do snapshot: um export que falhou não impede o reparo do filtro.
+        refresh_bloom_filter()
+        try:
+            time.sleep(max(0.0, SNAPSHOT_INTERVAL - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            log.info("Snapshot exporter interrupted by user.")
+            break
+
+if __name__ == '__main__':
+    install_reload_handler()
+    run_exporter()
@@ -1,17 +1,15 @@
 # telegram_bot.py
-import os
 import pika
 import json
 import time
 import httpx
-from dotenv import load_dotenv
+from Backend.core.config import settings
 from Backend.core.logger import log
 
 # -- Configuração Inicial --
-load_dotenv()
-TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
-TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
-RABBITMQ_URL = os.getenv("RABBITMQ_URL")
+TELEGRAM_BOT_TOKEN = settings.telegram_bot_token
+TELEGRAM_CHAT_ID = settings.telegram_chat_id
+RABBITMQ_URL = settings.rabbitmq_url
 ALERT_QUEUE_NAME = "alerts_queue"
 ALERT_EXCHANGE_NAME = "alerts_exchange"
 
@@ -1,69 +1,143 @@
-import pika
-import os
+import multiprocessing
+import signal
+import threading
 import time
-from dotenv import load_dotenv
+from collections import Counter
+from typing import Dict, List
 from sqlalchemy.orm import Session
-from Backend.core.database import SessionLocal
+from Backend.core.config import settings
+from Backend.core.database import SessionLocal, dispose_engines
 from Backend.models.models import URL
-from Backend.core.logger import log 
+from Backend.core.logger import flush_logs, install_reload_handler, log, hot_log
+from Backend.core.messaging import CLICK_PARTITIONS, get_click_transport
 
-load_dotenv()
-RABBITMQ_URL = os.getenv("RABBITMQ_URL")
-QUEUE_NAME = "click_events_queue"
+# Tempo máximo (segundos) para um processo terminar o lote em andamento após o SIGTERM.
+WORKER_SHUTDOWN_TIMEOUT = settings.worker_shutdown_timeout
 
 def get_db_session():
     """Generates a database session for the worker."""
     return SessionLocal()
 
-def process_click_event(ch, method, properties, body):
+def apply_clicks(short_codes: List[str]):
     """
-    Callback function executed for each message received from the queue.
+    Applies a batch of click events in one transaction, with a single
+    atomic increment per distinct short code.
+    Raises on failure so the transport leaves the batch unacknowledged.
     """
-    short_code = body.decode()
-    log.info(f"Received click event for: '{short_code}'")
-
+    counts = Counter(short_codes)
     db: Session = get_db_session()
     try:
-        db_url = db.query(URL).filter(URL.short_code == short_code).first()
-        if db_url:
-            db_url.current_clicks += 1
-            db.commit()
-            log.info(f"Database updated for '{short_code}'. Clicks: {db_url.current_clicks}")
-        else:
-            log.warning(f"Short code '{short_code}' not found in DB.")
-        
-        # Acknowledge the message has been successfully processed.
-        ch.basic_ack(delivery_tag=method.delivery_tag)
+        # Ordem fixa das linhas: duas transações nunca esperam uma pela outra em ordem inversa.
+        for short_code, clicks in sorted(counts.items()):
+            updated = (
+                db.query(URL)
+                .filter(URL.short_code == short_code)
+                .update({URL.current_clicks: URL.current_clicks + clicks}, synchronize_session=False)
+            )
+            if not updated:
+                log.warning("Short code '{}' not found in DB.", short_code)
+        db.commit()
+        hot_log.info("Database updated with {} click events for {} URLs.", len(short_codes), len(counts))
     except Exception as e:
-        log.error(f"Failed to process message for '{short_code}'. Error: {e}")
+        log.error(f"Failed to process a batch of {len(short_codes)} click events. Error: {e}")
         db.rollback()
+        raise
     finally:
         db.close()
 
-def connect_and_consume():
-    """Connects to RabbitMQ and starts consuming messages with a retry mechanism."""
-    while True:
+def connect_and_consume(partition: int = 0):
+    """
+    Consumes click events of one partition from the configured transport,
+    with a retry mechanism. SIGTERM or CTRL+C stop it gracefully: the batch
+    in flight is applied and acknowledged before the function returns.
+    The consumer of partition 0 first drains the queues or streams left
+    behind by an earlier CLICK_PARTITIONS value, so resizing loses nothing.
+    """
+    transport = get_click_transport(partition=partition)
+    if threading.current_thread() is threading.main_thread():
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: transport.stop())
+    while not transport.stopped:
         try:
-            connection = pika.BlockingConnection(pika.URLParameters(RABBITMQ_URL))
-            channel = connection.channel()
-            
-            # durable=True ensures that the queue will survive a RabbitMQ restart.
-            channel.queue_declare(queue=QUEUE_NAME, durable=True)
-            
-            # Set up the subscription on the queue
-            channel.basic_consume(queue=QUEUE_NAME, on_message_callback=process_click_event)
-            
-            log.info('Worker is waiting for click events. To exit press CTRL+C')
-            channel.start_consuming()
-        except pika.exceptions.AMQPConnectionError as e:
-            log.error(f"Could not connect to RabbitMQ: {e}. Retrying in 5 seconds...")
-            time.sleep(5)
-        except KeyboardInterrupt:
-            log.info("Worker consumer interrupted by user.")
-            break
+            if partition == 0:
+                # Filas/streams de um CLICK_PARTITIONS anterior não têm mais consumidor próprio.
+                drained = transport.drain_stale_partitions(apply_clicks)
+                if drained:
+                    log.warning(f"Drained {drained} click events left in partitions of an earlier CLICK_PARTITIONS.")
+            log.info(
+                f"Worker is waiting for click events via '{transport.name}' (partition {partition}). To exit press CTRL+C"
+            )
+            transport.consume(apply_clicks)
         except Exception as e:
-            log.critical(f"An unrecoverable error occurred in the worker: {e}")
-            break
+            if transport.stopped:
+                break
+            # Lotes não confirmados são reentregues pelo transporte após a reconexão.
+            log.error(f"Click consumer stopped: {e}. Retrying in 5 seconds...")
+            transport.wait(5)
+    log.info(f"Worker for partition {partition} stopped.")
+    transport.close()
+
+def _run_partition(partition: int):
+    """Entry point of a supervised consumer process."""
+    # Os handlers herdados só setariam o `stopping` da cópia do supervisor; até o
+    # connect_and_consume instalar os seus, SIGTERM/SIGINT encerram o processo.
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, signal.SIG_DFL)
+    # As conexões do pool herdadas pelo fork pertencem ao processo pai.
+    dispose_engines(close=False)
+    try:
+        connect_and_consume(partition)
+    finally:
+        # O processo filho sai com os._exit(), sem atexit: esvazia a fila de logs antes.
+        flush_logs()
+
+def run_supervisor(partitions: int = CLICK_PARTITIONS):
+    """
+    Starts one consumer process per click partition and restarts any that
+    dies. Codes are partitioned by consistent hash, so every `urls` row is
+    only updated by one process and the processes never contend on locks.
+    On SIGTERM or CTRL+C each process finishes its batch in flight; those
+    still running after WORKER_SHUTDOWN_TIMEOUT are killed.
+    """
+    if partitions <= 1:
+        connect_and_consume(0)
+        return
+
+    context = multiprocessing.get_context("fork")
+    stopping = threading.Event()
+    processes: Dict[int, multiprocessing.Process] = {}
+
+    def start(partition: int):
+        process = context.Process(target=_run_partition, args=(partition,), name=f"click-worker-{partition}")
+        process.start()
+        processes[partition] = process
+
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stopping.set())
+
+    for partition in range(partitions):
+        start(partition)
+    log.info(f"Worker supervisor started {partitions} consumer processes.")
+
+    while not stopping.wait(1):
+        for partition, process in list(processes.items()):
+            if not process.is_alive():
+                log.error(f"Consumer for partition {partition} exited with code {process.exitcode}. Restarting it.")
+                start(partition)
+
+    log.info("Stopping consumer processes...")
+    for process in processes.values():
+        if process.is_alive():
+            process.terminate()  # SIGTERM: o processo termina o lote atual antes de sair
+    deadline = time.monotonic() + WORKER_SHUTDOWN_TIMEOUT
+    for partition, process in processes.items():
+        process.join(max(0.0, deadline - time.monotonic()))
+        if process.is_alive():
+            log.error(f"Consumer for partition {partition} did not stop in time. Killing it.")
+            process.kill()
+            process.join()
+    log.info("Worker supervisor stopped.")
 
 if __name__ == '__main__':
-    connect_and_consume()
\ No newline at end of file
+    install_reload_handler()
+    run_supervisor()